@@ -1,7 +1,14 @@
+import hashlib
+import heapq
+import weakref
+from collections import Counter
 from copy import copy, deepcopy
 from typing import List
 import src.shape
 import src.instance
+import src.spatial_index
+import src.lod_summary
+import src.rwlock
 
 
 class Design:
@@ -11,15 +18,28 @@ class Design:
        Embedded designs are modeled through Instance objects. 
        An instance has a reference to another design object and where it is situated with respect to the parent design.
 
+       Designs are safe to use from several threads. Queries hold the read lock of src.rwlock.design_lock,
+       so many threads can query at the same time, and edits hold its write lock, so queries never see half-applied edits.
+       Use design_lock.writing() to apply several edits atomically, and design_lock.reading() to run several
+       queries against the same state of the designs.
+
     Attributes:
-        self._shapes (List[Shape]): Shapes at the top-level of the design.
+        self._shapes (Dict[int, List[Shape]]): Shapes at the top-level of the design, partitioned by layer.
+                                              Only layers with at least one shape have a partition.
         self._instances (List[Instance]): Instances embedded in the design
+        self._parents (WeakKeyDictionary[Design, int]): Designs that embed this design, counted once per embedding instance.
+                                                        Held weakly, so discarded designs drop out of the hierarchy.
+        self._children (Counter[Design]): Designs embedded in this design, counted once per instance
+        self._layer_stats (Dict[int, List[int]]): [shape count, summed area] of the design's own shapes per layer.
+                                                  Kept up to date on every edit.
+        self._cache (dict): Results derived from the design's content (e.g. content hash). Cleared on every edit.
+                            Queries fill it in through a local reference, so they are unaffected if it is replaced meanwhile.
 
     Methods:
         def __init__(self):
             Initializes the design instance. A design starts out empty, without any shapes or instances
 
-        def add_shape(self, x_offset: int, y_offset: int, height: int, width: int) -> Shape:
+        def add_shape(self, x_offset: int, y_offset: int, height: int, width: int, layer: int = 0) -> Shape:
             Creates a shape with the given parameters and adds it to the design.
             Returns the newly created and added shape.
 
@@ -40,24 +60,55 @@ class Design:
             Returns a list of instances belonging to the design.
             Does not return instances belonging to other designs embedded within the design.
 
-        def get_shapes(self) -> List[Shape]:
+        def get_shapes(self, layer: int = None) -> List[Shape]:
             Returns a list of shapes in the design.
 
-        def get_shapes_inorder_of_descending_area(self) -> List[Shape]:
+        def get_shapes_inorder_of_descending_area(self, layer: int = None) -> List[Shape]:
             Returns a list of shapes in the design sorted by area in descending order.
 
-        def get_shapes_within_one_level(self) -> List[Shape]:
+        def get_shapes_within_one_level(self, layer: int = None) -> List[Shape]:
             Returns a list of shapes representing all shapes within 1 level of the design's hierarchy.
             The shapes in the returned list are deep copies of the shapes in the design.
             The copied shapes have their x and y offets updated such that they are now relative to the top-level design.
+
+        def get_content_hash(self) -> str:
+            Returns a hash of the design's shapes and of all designs embedded within it.
+            Two designs with equal hashes describe the same geometry.
+
+        def get_layers(self) -> FrozenSet[int]:
+            Returns the layers used by shapes of the design and of its embedded designs.
+
+        def get_bounding_box(self, layer: int = None) -> Tuple[int]:
+            Returns the smallest box enclosing all shapes of the design and of its embedded designs.
+
+        def nearest_shapes(self, x: int, y: int, k: int = 1, depth: int = None, layer: int = None) -> List[Shape]:
+            Returns the k shapes closest to the point (x, y), searching through embedded designs.
+
+        def extract_window(self, x_min: int, y_min: int, x_max: int, y_max: int, layer: int = None) -> Design:
+            Returns a new design containing only the geometry inside the window, clipped at its boundary.
+
+        def get_lod_summary(self, layer: int = None) -> LodSummary:
+            Returns a coarse summary (bounding box, shape count, occupancy grid) of the design hierarchy.
+
+        def get_shapes_for_view(self, x_min: int, y_min: int, x_max: int, y_max: int, scale: float, min_size: float = 4,
+                                layer: int = None) -> Tuple[List]:
+            Returns the shapes to draw in a view of the design, and summaries of instances too small to draw in detail.
+
+        def stats(self, layer: int = None) -> Tuple[int]:
+            Returns the number of shapes and their total area in the design hierarchy, without flattening it.
     """
 
     def __init__(self):
         """Initializes the design instance. A design starts out empty, without any shapes or instances."""
-        self._shapes = []
+        self._shapes = {}
         self._instances = []
+        self._parents = weakref.WeakKeyDictionary()
+        self._children = Counter()
+        self._layer_stats = {}
+        self._cache = {}
 
-    def add_shape(self, x_offset: int, y_offset: int, height: int, width: int) -> src.shape.Shape:
+    @src.rwlock.write_locked
+    def add_shape(self, x_offset: int, y_offset: int, height: int, width: int, layer: int = 0) -> src.shape.Shape:
         """Creates a shape with the given parameters and adds it to the design.
            Returns the newly created and added shape.
 
@@ -66,14 +117,16 @@ class Design:
             y_offset (int): y offset with respect to the origin (0,0) of the parent design
             width (int): Width of shape. Must be a positive integer
             height (int): Height of shape. Must be a positive integer
+            layer (int): Layer the shape is drawn on
 
         Returns:
             (Shape): The newly created shape that was added to the design.
         """
-        new_shape = src.shape.Shape(x_offset, y_offset, height, width)
-        self._shapes.append(new_shape)
+        new_shape = src.shape.Shape(x_offset, y_offset, height, width, layer)
+        self._adopt_shape(new_shape)
         return new_shape
 
+    @src.rwlock.write_locked
     def add_shape_copy(self, shape: src.shape.Shape) -> src.shape.Shape:
         """Creates a deep copy of an existing shape and adds the copy to the design.
            Returns the newly created copy.
@@ -91,9 +144,10 @@ class Design:
             raise TypeError(error_message)
 
         shape_copy = deepcopy(shape)
-        self._shapes.append(shape_copy)
+        self._adopt_shape(shape_copy)
         return shape_copy
 
+    @src.rwlock.write_locked
     def add_instance(self, x_offset: int, y_offset: int, design_ref) -> src.instance.Instance:
         """Creates an instance with the given parameters and adds it to the design.
            Returns the newly created and added instance.
@@ -107,9 +161,10 @@ class Design:
             (Instance): The newly created instance that was added to the design.
         """
         new_instance = src.instance.Instance(x_offset, y_offset, design_ref)
-        self._instances.append(new_instance)
+        self._adopt_instance(new_instance)
         return new_instance
 
+    @src.rwlock.write_locked
     def add_instance_copy(self, inst: src.instance.Instance) -> src.instance.Instance:
         """Creates a shallow copy of an existing instance and adds the copy to the design.
            Returns the newly created copy.
@@ -131,9 +186,10 @@ class Design:
             raise TypeError(error_message)
 
         instance_copy = copy(inst)
-        self._instances.append(instance_copy)
+        self._adopt_instance(instance_copy)
         return instance_copy
 
+    @src.rwlock.read_locked
     def get_instances(self) -> List[src.instance.Instance]:
         """Returns a list of instances belonging to the design.
            Does not return instances belonging to other designs embedded within the design.
@@ -143,32 +199,43 @@ class Design:
         """
         return self._instances[:]
 
-    def get_shapes(self) -> List[src.shape.Shape]:
+    @src.rwlock.read_locked
+    def get_shapes(self, layer: int = None) -> List[src.shape.Shape]:
         """Returns a list of shapes in the design.
 
            If the design contains/embeds other designs,
            the shapes of those embedded designs are NOT included in the list.
+           Shapes are grouped by layer in ascending order, and listed in the order they were added within a layer.
+
+        Args:
+            layer (int): Only return shapes on this layer. None returns shapes on all layers
 
         Returns:
             (List[Shape]): List of shapes in the design.
         """
-        return self._shapes[:]
+        return self._get_shape_list(layer)[:]
 
-    def get_shapes_inorder_of_descending_area(self) -> List[src.shape.Shape]:
+    @src.rwlock.read_locked
+    def get_shapes_inorder_of_descending_area(self, layer: int = None) -> List[src.shape.Shape]:
         """Returns a list of shapes in the design.
            The shapes are sorted by area in descending order.
 
            If the design contains/embeds other designs,
            the shapes of those embedded designs are NOT included in the list.
 
+        Args:
+            layer (int): Only return shapes on this layer. Shapes on other layers are not sorted.
+                         None returns shapes on all layers
+
         Returns:
             (List[Shape]): List of shapes in the design sorted in order of descending area.
         """
-        sorted_shapes = self._shapes[:]
+        sorted_shapes = self._get_shape_list(layer)[:]
         sorted_shapes.sort(key=lambda x: -x.get_area())
         return sorted_shapes
 
-    def get_shapes_within_one_level(self) -> List[src.shape.Shape]:
+    @src.rwlock.read_locked
+    def get_shapes_within_one_level(self, layer: int = None) -> List[src.shape.Shape]:
         """Returns a list of shapes representing all shapes within 1 level of the design's hierarchy.
            Only includes shapes at the design's own level, and shapes of its immediate instances/designs (one level down).
 
@@ -176,19 +243,483 @@ class Design:
            The copied shapes have their x and y offets updated such that they are now relative to the top-level design.
            Copies are used so that shapes in the design do not have their x and y offsets modified by this function.
 
+        Args:
+            layer (int): Only return shapes on this layer. None returns shapes on all layers
+
         Returns:
             List[Shape]: List containing copies of shapes within 1 level, with their locations relative to top-level design.
         """
         # start with copies of shapes at top-level
-        shapes_within_one_level = deepcopy(self._shapes)
+        shapes_within_one_level = deepcopy(self._get_shape_list(layer))
 
         # get shapes one-level down
         for inst in self._instances:
             inst_x_offset, inst_y_offset = inst.get_offsets()
             design_ref = inst.get_design_ref()
-            for shape in design_ref.get_shapes():
+            for shape in design_ref._get_shape_list(layer):
                 shape_copy = deepcopy(shape)
                 shape_copy.shift_offsets(inst_x_offset, inst_y_offset)
                 shapes_within_one_level.append(shape_copy)
 
         return shapes_within_one_level
+
+    @src.rwlock.read_locked
+    def get_layers(self) -> frozenset:
+        """Returns the layers used by shapes of the design and of the designs embedded within it.
+           The set is cached per design and recomputed after the design, or a design embedded within it, is edited.
+
+        Returns:
+            (FrozenSet[int]): Layers with at least one shape in the design hierarchy.
+        """
+        cache = self._cache
+        if 'layers' not in cache:
+            layers = set(self._shapes)
+            for design_ref in self._children:
+                layers.update(design_ref.get_layers())
+            cache['layers'] = frozenset(layers)
+        return cache['layers']
+
+    @src.rwlock.read_locked
+    def get_bounding_box(self, layer: int = None) -> tuple:
+        """Returns the smallest box enclosing all shapes of the design and of the designs embedded within it.
+           The box is cached per design and layer, and recomputed after the design, or a design embedded within it, is edited.
+
+        Args:
+            layer (int): Only enclose shapes on this layer. None encloses shapes on all layers
+
+        Returns:
+            (Tuple[int]): (x_min, y_min, x_max, y_max) relative to the design's origin, or None if the design has no shapes.
+        """
+        cache_key = ('bounding_box', layer)
+        cache = self._cache
+        if cache_key not in cache:
+            if layer is not None and layer not in self.get_layers():
+                cache[cache_key] = None
+                return None
+            bboxes = [shape.get_bounding_box() for shape in self._get_shape_list(layer)]
+            for inst in self._instances:
+                bbox = inst._design_ref.get_bounding_box(layer)
+                if bbox is not None:
+                    bboxes.append(_shift_bbox(bbox, inst._x_offset, inst._y_offset))
+            cache[cache_key] = src.spatial_index.bounding_box_union(bboxes)
+        return cache[cache_key]
+
+    @src.rwlock.read_locked
+    def nearest_shapes(self, x: int, y: int, k: int = 1, depth: int = None, layer: int = None) -> List[src.shape.Shape]:
+        """Returns the k shapes closest to the point (x, y), including shapes of embedded designs.
+
+           The distance to a shape is the euclidean distance from the point to the closest point of the rectangle,
+           so shapes containing the point are at distance 0.
+           The search is best-first over the spatial index of each design: index nodes and instances are visited
+           in order of the distance to their bounding box, so instances farther away than the k-th closest shape
+           are never descended into.
+
+           The returned shapes are copies, with their x and y offsets relative to this design.
+
+        Args:
+            x (int): x coordinate of the point with respect to the origin (0,0) of the design
+            y (int): y coordinate of the point with respect to the origin (0,0) of the design
+            k (int): Number of shapes to return. Must be a positive integer
+            depth (int): Number of hierarchy levels to search. 0 only searches the design's own shapes,
+                         1 also searches its immediate instances, and so on. None searches the whole hierarchy.
+            layer (int): Only search shapes on this layer. None searches shapes on all layers
+
+        Raises:
+            TypeError: Raised if x, y, k or depth are not integers
+            ValueError: Raised if k is not positive or depth is negative
+
+        Returns:
+            (List[Shape]): Up to k shape copies, closest first.
+        """
+        if not all(isinstance(value, int) for value in (x, y, k)) or not (depth is None or isinstance(depth, int)):
+            error_message = 'x, y, k and depth must be integers'
+            print(error_message)
+            raise TypeError(error_message)
+        if k < 1 or (depth is not None and depth < 0):
+            error_message = 'k must be a positive integer and depth must not be negative'
+            print(error_message)
+            raise ValueError(error_message)
+
+        nearest = []
+        root = self._get_spatial_index(layer).get_root()
+        if root is None:
+            return nearest
+
+        # heap entries: (squared distance, tie breaker, node, x shift, y shift, remaining depth)
+        # a shape's distance to its bounding box is exact, so shapes are final when they are popped
+        tie_breaker = 0
+        heap = [(src.spatial_index.squared_distance_to_box(x, y, root.bbox), tie_breaker, root, 0, 0, depth)]
+        while heap and len(nearest) < k:
+            _, _, node, x_shift, y_shift, remaining_depth = heapq.heappop(heap)
+            if not node.is_entry:
+                children = [(child, x_shift, y_shift, remaining_depth) for child in node.content]
+            elif isinstance(node.content, src.shape.Shape):
+                shape_copy = deepcopy(node.content)
+                shape_copy.shift_offsets(x_shift, y_shift)
+                nearest.append(shape_copy)
+                continue
+            elif remaining_depth == 0:
+                continue
+            else:
+                inst = node.content
+                child_root = inst._design_ref._get_spatial_index(layer).get_root()
+                next_depth = None if remaining_depth is None else remaining_depth - 1
+                children = [(child_root, x_shift + inst._x_offset, y_shift + inst._y_offset, next_depth)]
+
+            for child, child_x_shift, child_y_shift, child_depth in children:
+                tie_breaker += 1
+                heapq.heappush(heap, (src.spatial_index.squared_distance_to_box(x, y, child.bbox, child_x_shift, child_y_shift),
+                                      tie_breaker, child, child_x_shift, child_y_shift, child_depth))
+
+        return nearest
+
+    @src.rwlock.read_locked
+    def extract_window(self, x_min: int, y_min: int, x_max: int, y_max: int, layer: int = None):
+        """Returns a new design containing only the geometry inside the window (x_min, y_min, x_max, y_max).
+
+           Shapes crossing the boundary of the window are clipped to it. Shapes only touching the window are dropped.
+           Instances whose design lies completely inside the window are kept as instances of the same design.
+           Instances crossing the boundary refer to a new, cropped copy of their design instead.
+           Instances of the same design cut the same way by the window (e.g. a column of an array) share one cropped design.
+
+           The spatial index of each design is used to skip shapes and instances outside the window,
+           so the cost depends on the geometry inside the window rather than on the size of the design.
+           The new design uses the same coordinate system as this design. The design itself is not modified.
+
+           If a layer is given, only shapes on that layer are extracted. Instances completely inside the window only
+           keep referring to their design if all shapes of that design are on the layer.
+
+        Args:
+            x_min (int): left edge of the window with respect to the origin (0,0) of the design
+            y_min (int): bottom edge of the window with respect to the origin (0,0) of the design
+            x_max (int): right edge of the window. Must be greater than x_min
+            y_max (int): top edge of the window. Must be greater than y_min
+            layer (int): Only extract shapes on this layer. None extracts shapes on all layers
+
+        Raises:
+            TypeError: Raised if the window edges are not integers
+            ValueError: Raised if the window has no area
+
+        Returns:
+            (Design): New design with the geometry inside the window.
+        """
+        if not all(isinstance(value, int) for value in (x_min, y_min, x_max, y_max)):
+            error_message = 'window edges must be integers'
+            print(error_message)
+            raise TypeError(error_message)
+        if x_min >= x_max or y_min >= y_max:
+            error_message = 'window must have a positive width and height'
+            print(error_message)
+            raise ValueError(error_message)
+
+        window = (x_min, y_min, x_max, y_max)
+        bbox = self.get_bounding_box(layer)
+        if bbox is None or not src.spatial_index.boxes_overlap(bbox, window):
+            return Design()
+        return self._extract_window(window, layer, {})
+
+    def _extract_window(self, window: tuple, layer: int, cropped_designs: dict):
+        """Returns a new design containing the geometry of this design inside the window.
+
+        Args:
+            window (Tuple[int]): (x_min, y_min, x_max, y_max) relative to the design's origin.
+                                 Must overlap the design's bounding box on the layer
+            layer (int): Only extract shapes on this layer. None extracts shapes on all layers
+            cropped_designs (dict): designs already cropped, keyed by (id(design), window clipped to the design)
+        """
+        # only the part of the window covering the design matters, so instances cut the same way share a crop
+        bbox = self.get_bounding_box(layer)
+        window = (max(window[0], bbox[0]), max(window[1], bbox[1]), min(window[2], bbox[2]), min(window[3], bbox[3]))
+        crop_key = (id(self), window)
+        if crop_key in cropped_designs:
+            return cropped_designs[crop_key]
+
+        cropped = Design()
+        for node in self._get_spatial_index(layer).intersecting(window):
+            if isinstance(node.content, src.shape.Shape):
+                x_min, y_min = max(node.bbox[0], window[0]), max(node.bbox[1], window[1])
+                x_max, y_max = min(node.bbox[2], window[2]), min(node.bbox[3], window[3])
+                shape_copy = deepcopy(node.content)
+                shape_copy.set_offsets(x_min, y_min)
+                shape_copy.set_dimensions(x_max - x_min, y_max - y_min)
+                cropped._adopt_shape(shape_copy)
+                continue
+
+            inst = node.content
+            if src.spatial_index.box_contains(window, node.bbox) and \
+                    (layer is None or inst._design_ref.get_layers() == {layer}):
+                cropped._adopt_instance(src.instance.Instance(inst._x_offset, inst._y_offset, inst._design_ref))
+                continue
+            child_window = _shift_bbox(window, -inst._x_offset, -inst._y_offset)
+            cropped_child = inst._design_ref._extract_window(child_window, layer, cropped_designs)
+            if cropped_child.get_bounding_box() is not None:
+                cropped._adopt_instance(src.instance.Instance(inst._x_offset, inst._y_offset, cropped_child))
+
+        cropped_designs[crop_key] = cropped
+        return cropped
+
+    @src.rwlock.read_locked
+    def get_lod_summary(self, layer: int = None) -> src.lod_summary.LodSummary:
+        """Returns a coarse, level-of-detail summary of the design and the designs embedded within it.
+
+           The summary holds the bounding box, the number of shapes in the hierarchy and a coarse occupancy grid.
+           It is built bottom-up from the summaries of embedded designs, and cached per design,
+           so designs embedded several times are only summarized once.
+           The summary is rebuilt after the design, or a design embedded within it, is edited.
+
+        Args:
+            layer (int): Only summarize shapes on this layer. None summarizes shapes on all layers
+
+        Returns:
+            (LodSummary): Summary of the design, or None if the design hierarchy has no shapes (on the layer).
+        """
+        cache_key = ('lod_summary', layer)
+        cache = self._cache
+        if cache_key not in cache:
+            bbox = self.get_bounding_box(layer)
+            if bbox is None:
+                summary = None
+            else:
+                placed_summaries = []
+                for inst in self._instances:
+                    child_summary = inst._design_ref.get_lod_summary(layer)
+                    if child_summary is not None:
+                        placed_summaries.append((inst._x_offset, inst._y_offset, child_summary))
+                shape_boxes = [shape.get_bounding_box() for shape in self._get_shape_list(layer)]
+                summary = src.lod_summary.build_summary(bbox, shape_boxes, placed_summaries)
+            cache[cache_key] = summary
+        return cache[cache_key]
+
+    @src.rwlock.read_locked
+    def get_shapes_for_view(self, x_min: int, y_min: int, x_max: int, y_max: int, scale: float, min_size: float = 4,
+                            layer: int = None) -> tuple:
+        """Returns what a viewer needs to draw the window (x_min, y_min, x_max, y_max) of the design at a given zoom.
+
+           Instances are descended into only if their design is at least min_size pixels wide or high on screen.
+           Smaller instances are returned as level-of-detail summaries, so the cost of a zoomed-out view depends on
+           the number of visible instances, not on the number of shapes within them.
+           Shapes and instances outside the window are skipped using the spatial index of each design.
+
+           The returned shapes are copies, with their x and y offsets relative to this design.
+           Shapes are not clipped to the window.
+
+        Args:
+            x_min (int): left edge of the window with respect to the origin (0,0) of the design
+            y_min (int): bottom edge of the window with respect to the origin (0,0) of the design
+            x_max (int): right edge of the window. Must be greater than x_min
+            y_max (int): top edge of the window. Must be greater than y_min
+            scale (float): Number of pixels per unit of length. Must be positive
+            min_size (float): Smallest on-screen size, in pixels, of a design that is drawn in detail
+            layer (int): Only return shapes and summaries of this layer. None returns all layers
+
+        Raises:
+            TypeError: Raised if the window edges are not integers, or scale and min_size are not numbers
+            ValueError: Raised if the window has no area, scale is not positive or min_size is negative
+
+        Returns:
+            (Tuple[List]): (shapes, summaries). shapes is a list of shape copies to draw.
+                           summaries is a list of (x_offset, y_offset, LodSummary) for instances drawn as summaries,
+                           where the offsets place the origin of the summarized design relative to this design.
+        """
+        if not all(isinstance(value, int) for value in (x_min, y_min, x_max, y_max)) or \
+                not all(isinstance(value, (int, float)) for value in (scale, min_size)):
+            error_message = 'window edges must be integers, scale and min_size must be numbers'
+            print(error_message)
+            raise TypeError(error_message)
+        if x_min >= x_max or y_min >= y_max or scale <= 0 or min_size < 0:
+            error_message = 'window must have a positive width and height, scale must be positive and min_size must not be negative'
+            print(error_message)
+            raise ValueError(error_message)
+
+        shapes, summaries = [], []
+        pending = [(self, 0, 0)]
+        while pending:
+            design, x_shift, y_shift = pending.pop()
+            window = (x_min - x_shift, y_min - y_shift, x_max - x_shift, y_max - y_shift)
+            for node in design._get_spatial_index(layer).intersecting(window):
+                if isinstance(node.content, src.shape.Shape):
+                    shape_copy = deepcopy(node.content)
+                    shape_copy.shift_offsets(x_shift, y_shift)
+                    shapes.append(shape_copy)
+                    continue
+
+                inst = node.content
+                inst_x_shift, inst_y_shift = x_shift + inst._x_offset, y_shift + inst._y_offset
+                on_screen_size = max(node.bbox[2] - node.bbox[0], node.bbox[3] - node.bbox[1]) * scale
+                if on_screen_size < min_size:
+                    summaries.append((inst_x_shift, inst_y_shift, inst._design_ref.get_lod_summary(layer)))
+                else:
+                    pending.append((inst._design_ref, inst_x_shift, inst_y_shift))
+
+        return shapes, summaries
+
+    @src.rwlock.read_locked
+    def stats(self, layer: int = None) -> tuple:
+        """Returns the number of shapes and their total area in the design and the designs embedded within it.
+
+           Shapes of an embedded design are counted once per instance of it, as if the design was flattened.
+           The result is computed bottom-up without flattening the design: every design keeps running totals of its
+           own shapes, and the totals of each embedded design are multiplied by the number of instances of it.
+           Results are cached per design, so the cost is proportional to the number of unique designs in the
+           hierarchy, not to the number of shapes. After an edit only the edited design and the designs embedding
+           it are recomputed.
+
+        Args:
+            layer (int): Only count shapes on this layer. None counts shapes on all layers
+
+        Returns:
+            (Tuple[int]): (shape_count, total_area)
+        """
+        cache_key = ('stats', layer)
+        cache = self._cache
+        if cache_key not in cache:
+            if layer is None:
+                shape_count = sum(count for count, _ in self._layer_stats.values())
+                total_area = sum(area for _, area in self._layer_stats.values())
+            else:
+                shape_count, total_area = self._layer_stats.get(layer, (0, 0))
+            for design_ref, instance_count in self._children.items():
+                child_shape_count, child_total_area = design_ref.stats(layer)
+                shape_count += instance_count * child_shape_count
+                total_area += instance_count * child_total_area
+            cache[cache_key] = (shape_count, total_area)
+        return cache[cache_key]
+
+    def _get_spatial_index(self, layer: int = None) -> src.spatial_index.SpatialIndex:
+        """Returns a spatial index over the design's shapes and instances.
+           Instances are indexed by the bounding box of their design, shifted by the instance's offsets.
+           If a layer is given, only shapes on the layer and instances of designs using the layer are indexed.
+           The index is cached per design and layer, and rebuilt after the design, or a design embedded within it, is edited.
+        """
+        cache_key = ('spatial_index', layer)
+        cache = self._cache
+        if cache_key not in cache:
+            entries = [(shape.get_bounding_box(), shape) for shape in self._get_shape_list(layer)]
+            for inst in self._instances:
+                bbox = inst._design_ref.get_bounding_box(layer)
+                if bbox is not None:
+                    entries.append((_shift_bbox(bbox, inst._x_offset, inst._y_offset), inst))
+            cache[cache_key] = src.spatial_index.SpatialIndex(entries)
+        return cache[cache_key]
+
+    @src.rwlock.read_locked
+    def get_content_hash(self) -> str:
+        """Returns a hash of the design's shapes and of all designs embedded within it.
+
+           Two designs with equal hashes describe the same geometry, regardless of the order shapes and instances were added in.
+           The hash is computed bottom-up and cached per design, so designs embedded several times are only hashed once.
+           The cached hash is dropped whenever the design, or a design embedded within it, is edited.
+
+        Returns:
+            (str): Hex digest of the design's content.
+        """
+        cache = self._cache
+        if 'content_hash' not in cache:
+            shape_keys = sorted(shape._get_key() for shape in self._get_shape_list())
+            instance_keys = sorted((inst._x_offset, inst._y_offset, inst._design_ref.get_content_hash())
+                                   for inst in self._instances)
+            digest = hashlib.blake2b(repr((shape_keys, instance_keys)).encode(), digest_size=16)
+            cache['content_hash'] = digest.hexdigest()
+        return cache['content_hash']
+
+    def _get_shape_list(self, layer: int = None) -> List[src.shape.Shape]:
+        """Returns the shapes of a layer without copying the partition, or the shapes of all layers in ascending layer order.
+           The returned list must not be modified.
+        """
+        if layer is not None:
+            return self._shapes.get(layer, [])
+        if len(self._shapes) == 1:
+            return next(iter(self._shapes.values()))
+        return [shape for layer in sorted(self._shapes) for shape in self._shapes[layer]]
+
+    def _adopt_shape(self, shape: src.shape.Shape) -> None:
+        """Adds a shape to the design and makes the design its owner."""
+        shape._owner = self
+        self._shapes.setdefault(shape._layer, []).append(shape)
+        self._update_layer_stats(shape._layer, 1, shape._width * shape._height)
+        self._invalidate()
+
+    def _move_shape_layer(self, shape: src.shape.Shape, old_layer: int) -> None:
+        """Moves a shape of the design from the partition of its old layer to the partition of its current layer."""
+        partition = self._shapes[old_layer]
+        # shapes compare equal by value, so the shape is located by identity
+        del partition[next(i for i, candidate in enumerate(partition) if candidate is shape)]
+        if not partition:
+            del self._shapes[old_layer]
+        self._shapes.setdefault(shape._layer, []).append(shape)
+        area = shape._width * shape._height
+        self._update_layer_stats(old_layer, -1, -area)
+        self._update_layer_stats(shape._layer, 1, area)
+        self._invalidate()
+
+    def _update_layer_stats(self, layer: int, count_delta: int, area_delta: int) -> None:
+        """Adds to the running shape count and area of the design's own shapes on a layer."""
+        layer_stats = self._layer_stats.setdefault(layer, [0, 0])
+        layer_stats[0] += count_delta
+        layer_stats[1] += area_delta
+        if not layer_stats[0]:
+            del self._layer_stats[layer]
+
+    def _adopt_instance(self, inst: src.instance.Instance) -> None:
+        """Adds an instance to the design and makes the design its owner."""
+        inst._owner = self
+        self._instances.append(inst)
+        self._replace_child(None, inst._design_ref)
+
+    def _replace_child(self, old_design_ref, new_design_ref) -> None:
+        """Updates the parent links of embedded designs when an instance of this design changes its design reference.
+
+        Args:
+            old_design_ref (Design): design no longer referenced by the instance, or None
+            new_design_ref (Design): design now referenced by the instance, or None
+        """
+        if old_design_ref is not None:
+            old_design_ref._parents[self] -= 1
+            if old_design_ref._parents[self] <= 0:
+                del old_design_ref._parents[self]
+            self._children[old_design_ref] -= 1
+            if self._children[old_design_ref] <= 0:
+                del self._children[old_design_ref]
+        if new_design_ref is not None:
+            new_design_ref._parents[self] = new_design_ref._parents.get(self, 0) + 1
+            self._children[new_design_ref] += 1
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        """Drops cached results of the design and of every design that embeds it (directly or indirectly)."""
+        pending = [self]
+        visited = set()
+        while pending:
+            design = pending.pop()
+            if design in visited:
+                continue
+            visited.add(design)
+            design._clear_cache()
+            pending.extend(design._parents)
+
+    def _clear_cache(self) -> None:
+        """Drops cached results of the design."""
+        self._cache.clear()
+
+    def __getstate__(self) -> dict:
+        """Returns the state used for copying and pickling. Designs embedding this design are not copied along with it."""
+        state = self.__dict__.copy()
+        del state['_parents']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restores a copied or unpickled design. The design becomes the owner of its copied shapes and instances,
+           and is registered as a parent of the designs embedded within it.
+        """
+        self.__dict__.update(state)
+        self._parents = weakref.WeakKeyDictionary()
+        for item in self._get_shape_list() + self._instances:
+            if item._owner is None:
+                item._owner = self
+        for inst in self._instances:
+            inst._design_ref._parents[self] = inst._design_ref._parents.get(self, 0) + 1
+
+
+def _shift_bbox(bbox: tuple, x_offset: int, y_offset: int) -> tuple:
+    """Returns a bounding box (x_min, y_min, x_max, y_max) shifted by the given offsets."""
+    return (bbox[0] + x_offset, bbox[1] + y_offset, bbox[2] + x_offset, bbox[3] + y_offset)
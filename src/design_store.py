@@ -0,0 +1,369 @@
+import shelve
+import threading
+import weakref
+from collections import Counter, OrderedDict
+import src.design
+import src.shape
+import src.instance
+import src.rwlock
+
+
+class DesignStore:
+    """
+    A DesignStore keeps design hierarchies on disk and loads the shapes of each design only when they are needed.
+
+    Every unique design is stored as two records:
+        'meta/<key>': small summary kept in memory for every design reached so far: the embedded designs, shape counts
+                      and areas, layers, bounding boxes and content hash.
+        'data/<key>': the design's shapes and instances, loaded on demand.
+
+    Designs are returned as LazyDesign proxies. Queries answered by the summary (bounding boxes, stats, content hash)
+    and queries that prune a design by its bounding box never load its shapes. At most cache_size designs have their
+    shapes loaded at a time. When more are needed, the least recently used design is evicted.
+    Edited designs are written back to the store when evicted, or when sync() or close() is called.
+
+    Attributes:
+        self._shelf (shelve.Shelf): Persistent storage of the records
+        self._cache_size (int): Maximum number of designs with loaded shapes
+        self._proxies (Dict[str, LazyDesign]): The proxy of every design reached so far, by key
+        self._loaded (OrderedDict[LazyDesign, None]): Designs with loaded shapes, least recently used first
+        self._lock (threading.RLock): Guards the shelf and the LRU order, which change while queries read designs
+        self._evicting (bool): True while designs are being evicted
+
+    Methods:
+        def __init__(self, path: str, cache_size: int = 128):
+            Opens (or creates) the store at the given path.
+
+        def save(self, design: Design) -> str:
+            Writes a design hierarchy to the store and returns the key of the top-level design.
+
+        def load(self, key: str) -> LazyDesign:
+            Returns a proxy for the stored design with the given key.
+
+        def get_loaded_count(self) -> int:
+            Returns the number of designs whose shapes are currently loaded.
+
+        def sync(self) -> None:
+            Writes edits of every design back to the store.
+
+        def close(self) -> None:
+            Writes edits back to the store and closes it.
+    """
+
+    def __init__(self, path: str, cache_size: int = 128):
+        """Opens (or creates) the store at the given path.
+
+        Args:
+            path (str): File name of the store, passed to shelve.open()
+            cache_size (int): Maximum number of designs with loaded shapes. Must be a positive integer
+
+        Raises:
+            TypeError: Raised if cache_size is not an integer
+            ValueError: Raised if cache_size is not positive
+        """
+        if not isinstance(cache_size, int):
+            error_message = 'cache_size must be an integer'
+            print(error_message)
+            raise TypeError(error_message)
+        if cache_size < 1:
+            error_message = 'cache_size must be a positive integer'
+            print(error_message)
+            raise ValueError(error_message)
+
+        self._shelf = shelve.open(path)
+        self._cache_size = cache_size
+        self._proxies = {}
+        self._loaded = OrderedDict()
+        self._lock = threading.RLock()
+        self._evicting = False
+
+    @src.rwlock.read_locked
+    def save(self, design) -> str:
+        """Writes a design hierarchy to the store and returns the key of the top-level design.
+
+           Every unique design in the hierarchy is written once. Designs loaded from this store are not written again,
+           unless they were edited. The designs themselves are not modified; use load() to get a lazily loaded proxy.
+
+        Args:
+            design (Design): top-level design of the hierarchy
+
+        Raises:
+            TypeError: Raised if design is not of type Design
+
+        Returns:
+            (str): Key of the top-level design.
+        """
+        if not isinstance(design, src.design.Design):
+            error_message = f'Input argument {design} is not of type Design'
+            print(error_message)
+            raise TypeError(error_message)
+
+        with self._lock:
+            key = self._save(design, {})
+            self._shelf.sync()
+            return key
+
+    @src.rwlock.read_locked
+    def load(self, key: str):
+        """Returns a proxy for the stored design with the given key.
+           The same proxy is returned every time a key is loaded. Its shapes are only read when first needed.
+
+        Args:
+            key (str): key returned by save()
+
+        Raises:
+            KeyError: Raised if no design with the key is stored
+
+        Returns:
+            (LazyDesign): Proxy for the stored design.
+        """
+        with self._lock:
+            if key not in self._proxies:
+                meta_key = 'meta/' + key
+                if meta_key not in self._shelf:
+                    error_message = f'No design with key {key} is stored'
+                    print(error_message)
+                    raise KeyError(error_message)
+                meta = self._shelf[meta_key]
+                proxy = LazyDesign(self, key, meta)
+                self._proxies[key] = proxy
+                for child_key, instance_count in meta['children'].items():
+                    child = self.load(child_key)
+                    child._parents[proxy] = child._parents.get(proxy, 0) + instance_count
+                    proxy._children[child] += instance_count
+            return self._proxies[key]
+
+    def get_loaded_count(self) -> int:
+        """Returns the number of designs whose shapes are currently loaded.
+
+        Returns:
+            (int): Number of loaded designs, at most cache_size
+        """
+        with self._lock:
+            return len(self._loaded)
+
+    @src.rwlock.read_locked
+    def sync(self) -> None:
+        """Writes edits of every design back to the store.
+           Designs whose summary is out of date because an embedded design was edited are loaded to update it.
+        """
+        with self._lock:
+            for proxy in list(self._proxies.values()):
+                if proxy._dirty or proxy._meta_stale:
+                    self._write_back(proxy)
+            self._shelf.sync()
+
+    def close(self) -> None:
+        """Writes edits back to the store and closes it. Proxies of the store must not be used afterwards."""
+        self.sync()
+        with self._lock:
+            self._shelf.close()
+
+    def _save(self, design, saved_keys: dict) -> str:
+        """Writes a design and the designs embedded within it, and returns its key.
+
+        Args:
+            design (Design): design to write
+            saved_keys (dict): keys of designs already written during this save, by id(design)
+        """
+        if isinstance(design, LazyDesign) and design._store is self:
+            if design._dirty or design._meta_stale:
+                self._write_back(design, saved_keys)
+            return design._key
+        if id(design) not in saved_keys:
+            key = self._new_key()
+            self._write(key, design, saved_keys)
+            saved_keys[id(design)] = key
+        return saved_keys[id(design)]
+
+    def _write_back(self, proxy, saved_keys: dict = None) -> None:
+        """Writes the shapes and summary of a proxy to the store, and marks it as unchanged."""
+        self._write(proxy._key, proxy, {} if saved_keys is None else saved_keys, write_data=proxy._dirty)
+        proxy._dirty = False
+        proxy._meta_stale = False
+
+    def _write(self, key: str, design, saved_keys: dict, write_data: bool = True) -> None:
+        """Writes the records of a design under the given key. Embedded designs are written first."""
+        child_keys = {child: self._save(child, saved_keys) for child in design._children}
+        if write_data:
+            self._shelf['data/' + key] = {
+                'shapes': [shape._get_key() for shape in design._get_shape_list()],
+                'instances': [(inst._x_offset, inst._y_offset, child_keys[inst._design_ref]) for inst in design._instances],
+            }
+
+        layers = design.get_layers()
+        self._shelf['meta/' + key] = {
+            'children': {child_keys[child]: count for child, count in design._children.items()},
+            'layer_stats': {layer: list(layer_stats) for layer, layer_stats in design._layer_stats.items()},
+            'layers': layers,
+            'bounding_boxes': {layer: design.get_bounding_box(layer) for layer in list(layers) + [None]},
+            'stats': {layer: design.stats(layer) for layer in list(layers) + [None]},
+            'content_hash': design.get_content_hash(),
+        }
+        if isinstance(design, LazyDesign) and design._store is self:
+            design._meta = self._shelf['meta/' + key]
+
+    def _new_key(self) -> str:
+        """Returns a key that is not used by any stored design."""
+        next_key = self._shelf.get('next_key', 0)
+        self._shelf['next_key'] = next_key + 1
+        return f'design_{next_key}'
+
+    def _load_content(self, proxy) -> tuple:
+        """Returns the shapes and instances of a proxy, reading them from the store if they are not loaded.
+           Marks the proxy as most recently used, and evicts the least recently used designs if too many are loaded.
+        """
+        with self._lock:
+            if proxy._content is not None:
+                self._loaded.move_to_end(proxy)
+                return proxy._content
+
+            data = self._shelf['data/' + proxy._key]
+            shape_refs, instance_refs = proxy._survivors
+            proxy._survivors = ([], [])
+            shapes = {}
+            for i, (x_offset, y_offset, width, height, layer) in enumerate(data['shapes']):
+                shape = shape_refs[i]() if shape_refs else None
+                if shape is None:
+                    shape = src.shape.Shape(x_offset, y_offset, width, height, layer)
+                    shape._owner = proxy
+                # a survivor moved to another layer since is filed under its stored layer, which set_layer() moves it from
+                shapes.setdefault(layer, []).append(shape)
+            instances = []
+            for i, (x_offset, y_offset, child_key) in enumerate(data['instances']):
+                inst = instance_refs[i]() if instance_refs else None
+                if inst is None:
+                    inst = src.instance.Instance(x_offset, y_offset, self.load(child_key))
+                    inst._owner = proxy  # parent links were registered when the proxy was created
+                instances.append(inst)
+
+            content = (shapes, instances)
+            proxy._content = content
+            self._loaded[proxy] = None
+            self._evict_if_needed()
+            return content
+
+    def _evict_if_needed(self) -> None:
+        """Evicts least recently used designs until at most cache_size designs are loaded."""
+        if self._evicting:
+            return
+        self._evicting = True
+        try:
+            while len(self._loaded) > self._cache_size:
+                proxy = next(iter(self._loaded))
+                if proxy._dirty or proxy._meta_stale:
+                    self._write_back(proxy)
+                self._loaded.pop(proxy, None)
+                proxy._unload()
+        finally:
+            self._evicting = False
+
+
+class LazyDesign(src.design.Design):
+    """
+    A LazyDesign is a proxy for a design kept in a DesignStore.
+    It behaves like a Design, but its shapes and instances are only read from the store when they are first accessed,
+    and are dropped again when the store evicts the design.
+
+    Bounding boxes, stats, layers and the content hash are answered from the stored summary without loading shapes,
+    until the design or a design embedded within it is edited.
+    Shapes and instances still referenced elsewhere when the design is evicted keep belonging to it, and are reused
+    when the design is loaded again, so edits made through them are never lost.
+
+    Attributes:
+        self._store (DesignStore): Store the design is kept in
+        self._key (str): Key of the design in the store
+        self._meta (dict): Stored summary of the design
+        self._content (Tuple): (shapes by layer, instances) if loaded, else None
+        self._survivors (Tuple[List[weakref.ref]]): Weak references to the shapes and instances dropped by the last
+                                                    eviction, in the order of the stored record
+        self._dirty (bool): True if the shapes or instances were edited since they were loaded
+        self._meta_stale (bool): True if the stored summary is out of date because an embedded design was edited
+
+    Methods:
+        def get_key(self) -> str:
+            Returns the key of the design in the store.
+
+        def is_loaded(self) -> bool:
+            Returns True if the shapes of the design are loaded.
+    """
+
+    def __init__(self, store: DesignStore, key: str, meta: dict):
+        """Initializes the proxy from the stored summary, without loading shapes. Use DesignStore.load() to get proxies.
+
+        Args:
+            store (DesignStore): Store the design is kept in
+            key (str): Key of the design in the store
+            meta (dict): Stored summary of the design
+        """
+        self._store = store
+        self._key = key
+        self._meta = meta
+        self._content = None
+        self._survivors = ([], [])
+        self._dirty = False
+        self._meta_stale = False
+        self._parents = weakref.WeakKeyDictionary()
+        self._children = Counter()
+        self._layer_stats = {layer: list(layer_stats) for layer, layer_stats in meta['layer_stats'].items()}
+        self._cache = self._cache_from_meta()
+
+    @property
+    def _shapes(self) -> dict:
+        """Shapes of the design partitioned by layer, loaded from the store on first access."""
+        return self._store._load_content(self)[0]
+
+    @property
+    def _instances(self) -> list:
+        """Instances of the design, loaded from the store on first access."""
+        return self._store._load_content(self)[1]
+
+    def get_key(self) -> str:
+        """Returns the key of the design in the store.
+
+        Returns:
+            (str): Key of the design
+        """
+        return self._key
+
+    def is_loaded(self) -> bool:
+        """Returns True if the shapes of the design are loaded.
+
+        Returns:
+            (bool): True if the shapes are in memory
+        """
+        return self._content is not None
+
+    def _invalidate(self) -> None:
+        """Marks the design as edited, so it is written back before it is evicted, and drops cached results.
+           An edit through a shape or instance held across an eviction loads the design again, so the edited object
+           is part of the content written back, even if the caller lets go of it afterwards.
+        """
+        self._dirty = True
+        self._store._load_content(self)
+        super()._invalidate()
+
+    def _clear_cache(self) -> None:
+        """Drops cached results, including the results taken from the stored summary, which is now out of date."""
+        self._meta_stale = True
+        super()._clear_cache()
+
+    def _unload(self) -> None:
+        """Drops the loaded shapes and instances, keeping weak references to reuse those still referenced elsewhere.
+           Eviction runs under the read lock, so the cache is replaced instead of cleared under other readers.
+        """
+        shapes, instances = self._content
+        self._survivors = ([weakref.ref(shape) for layer in sorted(shapes) for shape in shapes[layer]],
+                           [weakref.ref(inst) for inst in instances])
+        self._content = None
+        self._cache = self._cache_from_meta()
+
+    def _cache_from_meta(self) -> dict:
+        """Returns a cache filled with results taken from the stored summary."""
+        meta = self._meta
+        cache = {'layers': frozenset(meta['layers']), 'content_hash': meta['content_hash']}
+        for layer, bbox in meta['bounding_boxes'].items():
+            cache[('bounding_box', layer)] = bbox
+        for layer, stats in meta['stats'].items():
+            cache[('stats', layer)] = stats
+        return cache
@@ -0,0 +1,263 @@
+from collections import defaultdict
+from typing import List
+import src.shape
+import src.rwlock
+
+
+class DesignDiff:
+    """
+    A DesignDiff describes the shapes that differ between two design hierarchies.
+
+    Every entry records where the shape lies in the hierarchy as a path.
+    A path is a tuple of Instance objects, starting with an instance of the top-level design and ending with the
+    instance whose referenced design holds the shape. Shapes at the top-level of a design have an empty path ().
+    Shapes are new Shape objects whose offsets are relative to the top-level design.
+
+    Attributes:
+        self._added (List[Tuple]): (path, shape) for every shape that only exists in the new design
+        self._removed (List[Tuple]): (path, shape) for every shape that only exists in the old design
+        self._moved (List[Tuple]): (old_path, old_shape, new_path, new_shape) for every shape with the same dimensions
+                                   that lies at a different location in the new design
+
+    Methods:
+        def get_added(self) -> List[Tuple]:
+            Returns shapes that only exist in the new design.
+
+        def get_removed(self) -> List[Tuple]:
+            Returns shapes that only exist in the old design.
+
+        def get_moved(self) -> List[Tuple]:
+            Returns shapes that were moved between the old and the new design.
+
+        def is_empty(self) -> bool:
+            Returns True if the two designs describe the same geometry.
+    """
+
+    def __init__(self, added: List[tuple], removed: List[tuple], moved: List[tuple]):
+        """Initializes the lists of added, removed and moved shapes.
+
+        Args:
+            added (List[Tuple]): (path, shape) for every added shape
+            removed (List[Tuple]): (path, shape) for every removed shape
+            moved (List[Tuple]): (old_path, old_shape, new_path, new_shape) for every moved shape
+        """
+        self._added = added
+        self._removed = removed
+        self._moved = moved
+
+    def get_added(self) -> List[tuple]:
+        """Returns shapes that only exist in the new design.
+
+        Returns:
+            (List[Tuple]): List of (path, shape)
+        """
+        return self._added[:]
+
+    def get_removed(self) -> List[tuple]:
+        """Returns shapes that only exist in the old design.
+
+        Returns:
+            (List[Tuple]): List of (path, shape)
+        """
+        return self._removed[:]
+
+    def get_moved(self) -> List[tuple]:
+        """Returns shapes that were moved between the old and the new design.
+
+        Returns:
+            (List[Tuple]): List of (old_path, old_shape, new_path, new_shape)
+        """
+        return self._moved[:]
+
+    def is_empty(self) -> bool:
+        """Returns True if the two designs describe the same geometry.
+
+        Returns:
+            (bool): True if no shape was added, removed or moved.
+        """
+        return not (self._added or self._removed or self._moved)
+
+
+@src.rwlock.read_locked
+def diff_designs(design_a, design_b) -> DesignDiff:
+    """Returns the shapes that differ between an old design hierarchy (design_a) and a new one (design_b).
+
+       Designs are compared by their content hashes first, so identical embedded designs are skipped without
+       looking at their shapes. Within designs that differ, shapes are matched by sorting them, which takes O(nlogn).
+
+       Shapes with the same location and dimensions in both designs are unchanged.
+       Remaining shapes with the same dimensions are reported as moved, the rest as added or removed.
+       Instances with the same offsets are compared recursively. Instances of identical designs placed at
+       different offsets report all of their shapes as moved.
+
+    Args:
+        design_a (Design): old design
+        design_b (Design): new design
+
+    Returns:
+        (DesignDiff): Shapes added, removed, and moved between design_a and design_b.
+    """
+    added, removed, moved = _diff_pair(design_a, design_b, {})
+    return DesignDiff(
+        [(path, _make_shape(key)) for path, key in added],
+        [(path, _make_shape(key)) for path, key in removed],
+        [(path_a, _make_shape(key_a), path_b, _make_shape(key_b)) for path_a, key_a, path_b, key_b in moved])
+
+
+def _diff_pair(design_a, design_b, memo: dict) -> tuple:
+    """Returns added, removed, and moved shape keys between two designs, relative to their own origins.
+
+       Results are memoized per pair of designs, so a changed design embedded many times is only compared once.
+    """
+    memo_key = (id(design_a), id(design_b))
+    if memo_key in memo:
+        return memo[memo_key]
+
+    added, removed, moved = [], [], []
+    if design_a is not design_b and design_a.get_content_hash() != design_b.get_content_hash():
+        only_a, only_b = _unmatched(design_a._get_shape_list(), design_b._get_shape_list(), lambda shape: shape._get_key())
+        _match_moves([((), shape._get_key()) for shape in only_a],
+                     [((), shape._get_key()) for shape in only_b],
+                     added, removed, moved)
+
+        only_a, only_b = _unmatched(design_a._instances, design_b._instances, _instance_key)
+        only_a, only_b = _pair_instances(only_a, only_b, lambda inst: inst.get_offsets(),
+                                         lambda inst_a, inst_b: _diff_nested(inst_a, inst_b, memo, added, removed, moved))
+        only_a, only_b = _pair_instances(only_a, only_b, lambda inst: inst._design_ref.get_content_hash(),
+                                         lambda inst_a, inst_b: _moved_instance(inst_a, inst_b, moved))
+        for inst in only_a:
+            removed.extend(_flatten(inst))
+        for inst in only_b:
+            added.extend(_flatten(inst))
+
+    memo[memo_key] = (added, removed, moved)
+    return memo[memo_key]
+
+
+def _unmatched(items_a: list, items_b: list, key) -> tuple:
+    """Sorts both lists by key and drops items that have a counterpart with an equal key in the other list.
+
+    Returns:
+        (Tuple[list]): (items only in items_a, items only in items_b)
+    """
+    sorted_a = sorted(items_a, key=key)
+    sorted_b = sorted(items_b, key=key)
+    only_a, only_b = [], []
+    i = j = 0
+    while i < len(sorted_a) and j < len(sorted_b):
+        key_a, key_b = key(sorted_a[i]), key(sorted_b[j])
+        if key_a == key_b:
+            i += 1
+            j += 1
+        elif key_a < key_b:
+            only_a.append(sorted_a[i])
+            i += 1
+        else:
+            only_b.append(sorted_b[j])
+            j += 1
+    only_a.extend(sorted_a[i:])
+    only_b.extend(sorted_b[j:])
+    return only_a, only_b
+
+
+def _pair_instances(insts_a: list, insts_b: list, key, on_pair) -> tuple:
+    """Pairs up instances with equal keys and calls on_pair() for every pair.
+
+    Returns:
+        (Tuple[list]): (unpaired instances of insts_a, unpaired instances of insts_b)
+    """
+    groups_b = defaultdict(list)
+    for inst in insts_b:
+        groups_b[key(inst)].append(inst)
+
+    unpaired_a = []
+    for inst_a in insts_a:
+        group = groups_b.get(key(inst_a))
+        if group:
+            on_pair(inst_a, group.pop(0))
+        else:
+            unpaired_a.append(inst_a)
+
+    unpaired_b = [inst for group in groups_b.values() for inst in group]
+    return unpaired_a, unpaired_b
+
+
+def _match_moves(only_a: list, only_b: list, added: list, removed: list, moved: list) -> None:
+    """Pairs up unmatched (path, key) entries with the same dimensions as moved shapes.
+       Entries left without a partner are recorded as removed (only_a) or added (only_b).
+    """
+    groups_b = defaultdict(list)
+    for entry in sorted(only_b, key=lambda entry: entry[1]):
+        groups_b[_dimensions(entry[1])].append(entry)
+    for dims in groups_b:
+        groups_b[dims].reverse()
+
+    for path_a, key_a in sorted(only_a, key=lambda entry: entry[1]):
+        group = groups_b.get(_dimensions(key_a))
+        if group:
+            path_b, key_b = group.pop()
+            moved.append((path_a, key_a, path_b, key_b))
+        else:
+            removed.append((path_a, key_a))
+
+    for group in groups_b.values():
+        added.extend(reversed(group))
+
+
+def _diff_nested(inst_a, inst_b, memo: dict, added: list, removed: list, moved: list) -> None:
+    """Compares the designs of two instances placed at the same offsets, and records their differences."""
+    nested_added, nested_removed, nested_moved = _diff_pair(inst_a._design_ref, inst_b._design_ref, memo)
+    x_offset, y_offset = inst_a.get_offsets()
+    added.extend(((inst_b,) + path, _shift(key, x_offset, y_offset)) for path, key in nested_added)
+    removed.extend(((inst_a,) + path, _shift(key, x_offset, y_offset)) for path, key in nested_removed)
+    moved.extend(((inst_a,) + path_a, _shift(key_a, x_offset, y_offset), (inst_b,) + path_b, _shift(key_b, x_offset, y_offset))
+                 for path_a, key_a, path_b, key_b in nested_moved)
+
+
+def _moved_instance(inst_a, inst_b, moved: list) -> None:
+    """Records all shapes of two instances with identical designs placed at different offsets as moved."""
+    shapes_a = sorted(_flatten(inst_a, shift=False), key=lambda entry: entry[1])
+    shapes_b = sorted(_flatten(inst_b, shift=False), key=lambda entry: entry[1])
+    x_offset_a, y_offset_a = inst_a.get_offsets()
+    x_offset_b, y_offset_b = inst_b.get_offsets()
+    for (path_a, key_a), (path_b, key_b) in zip(shapes_a, shapes_b):
+        moved.append((path_a, _shift(key_a, x_offset_a, y_offset_a), path_b, _shift(key_b, x_offset_b, y_offset_b)))
+
+
+def _flatten(inst, shift: bool = True) -> List[tuple]:
+    """Returns (path, key) for every shape in the hierarchy below an instance, with paths starting at the instance.
+
+    Args:
+        inst (Instance): instance to flatten
+        shift (bool): if False, keys are relative to the origin of the instance's design instead of its parent design
+    """
+    flattened = []
+    x_offset, y_offset = inst.get_offsets() if shift else (0, 0)
+    pending = [((inst,), inst._design_ref, x_offset, y_offset)]
+    while pending:
+        path, design, x_offset, y_offset = pending.pop()
+        for shape in design._get_shape_list():
+            flattened.append((path, _shift(shape._get_key(), x_offset, y_offset)))
+        for child in design._instances:
+            pending.append((path + (child,), child._design_ref, x_offset + child._x_offset, y_offset + child._y_offset))
+    return flattened
+
+
+def _instance_key(inst) -> tuple:
+    """Returns a key identifying an instance by its offsets and the content of its design."""
+    return (inst._x_offset, inst._y_offset, inst._design_ref.get_content_hash())
+
+
+def _dimensions(key: tuple) -> tuple:
+    """Returns the part of a shape key that must be equal for two shapes to be considered a move."""
+    return key[2:]
+
+
+def _shift(key: tuple, x_offset: int, y_offset: int) -> tuple:
+    """Returns a shape key shifted by the given offsets."""
+    return (key[0] + x_offset, key[1] + y_offset) + key[2:]
+
+
+def _make_shape(key: tuple) -> src.shape.Shape:
+    """Creates a new shape from a shape key."""
+    return src.shape.Shape(*key)
@@ -1,14 +1,17 @@
 import src.design as design
+import src.rwlock
 
 
 class Instance:
     """
     An instance represents a design that is embedded in another design.
+    Instances that belong to a design hold src.rwlock.design_lock while they are read or edited.
 
     Attributes:
         self._x_offset (int): x offset with respect to origin (0,0) of the parent design
         self._y_offset (int): y offset with respect to origin (0,0) of the parent design
         self._design_ref (Design): Reference to the embedded design
+        self._owner (Design): design the instance belongs to, or None. The owner is notified whenever the instance changes.
 
     Methods:
         def __init__(self):
@@ -37,9 +40,12 @@ class Instance:
         Raises:
             TypeError: Raised if input parameters are not of expected type.
         """
+        self._owner = None
+        self._design_ref = None
         self.set_offsets(x_offset, y_offset)
         self.set_design_ref(design_ref)
 
+    @src.rwlock.write_locked_if_owned
     def set_offsets(self, x_offset: int, y_offset: int) -> None:
         """Sets the offset with respect to the origin (0, 0) of the parent design
 
@@ -57,7 +63,10 @@ class Instance:
 
         self._x_offset = x_offset
         self._y_offset = y_offset
+        if self._owner is not None:
+            self._owner._invalidate()
 
+    @src.rwlock.write_locked_if_owned
     def set_design_ref(self, design_ref) -> None:
         """Sets the design object that represents the embedded design
 
@@ -72,8 +81,11 @@ class Instance:
             print(error_message)
             raise TypeError(error_message)
 
+        if self._owner is not None:
+            self._owner._replace_child(self._design_ref, design_ref)
         self._design_ref = design_ref
 
+    @src.rwlock.read_locked_if_owned
     def get_offsets(self) -> int:
         """Returns offset with respect to parent design
 
@@ -82,6 +94,7 @@ class Instance:
         """
         return (self._x_offset, self._y_offset)
 
+    @src.rwlock.read_locked_if_owned
     def get_design_ref(self):
         """Gets the reference design
 
@@ -89,3 +102,9 @@ class Instance:
            (Design): The referenced design
         """
         return self._design_ref
+
+    def __getstate__(self) -> dict:
+        """Returns the state used for copying and pickling. The owner is not copied along with the instance."""
+        state = self.__dict__.copy()
+        state['_owner'] = None
+        return state
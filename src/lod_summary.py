@@ -0,0 +1,161 @@
+import math
+from typing import List
+
+
+GRID_SIZE = 8
+
+
+class LodSummary:
+    """
+    A LodSummary is a coarse, level-of-detail description of a design and all designs embedded within it.
+    Viewers draw the summary instead of the shapes when the design is too small on screen to show individual shapes.
+
+    The occupancy grid splits the design's bounding box into GRID_SIZE x GRID_SIZE cells of equal size.
+    Each cell holds the fraction of its area covered by shapes, between 0.0 and 1.0.
+    Overlapping shapes are counted once per shape, so the fraction is an estimate capped at 1.0.
+
+    Attributes:
+        self._bbox (Tuple[int]): (x_min, y_min, x_max, y_max) relative to the design's origin
+        self._shape_count (int): Number of shapes in the design hierarchy, counting shapes of every instance
+        self._grid (Tuple[Tuple[float]]): Occupancy grid. self._grid[row][column], row 0 is at y_min, column 0 at x_min
+
+    Methods:
+        def __init__(self, bbox: Tuple[int], shape_count: int, grid: List[List[float]]):
+            Initializes the summary.
+
+        def get_bounding_box(self) -> Tuple[int]:
+            Returns the bounding box of the summarized design.
+
+        def get_shape_count(self) -> int:
+            Returns the number of shapes in the summarized design hierarchy.
+
+        def get_occupancy_grid(self) -> Tuple[Tuple[float]]:
+            Returns the fraction of each grid cell covered by shapes.
+
+        def get_cell_box(self, row: int, column: int) -> Tuple[float]:
+            Returns the area covered by a grid cell.
+    """
+
+    def __init__(self, bbox: tuple, shape_count: int, grid: List[List[float]]):
+        """Initializes the summary.
+
+        Args:
+            bbox (Tuple[int]): (x_min, y_min, x_max, y_max) relative to the design's origin
+            shape_count (int): Number of shapes in the design hierarchy
+            grid (List[List[float]]): Occupancy grid, indexed by [row][column]
+        """
+        self._bbox = bbox
+        self._shape_count = shape_count
+        self._grid = tuple(tuple(row) for row in grid)
+
+    def get_bounding_box(self) -> tuple:
+        """Returns the bounding box of the summarized design.
+
+        Returns:
+            (Tuple[int]): (x_min, y_min, x_max, y_max) relative to the design's origin
+        """
+        return self._bbox
+
+    def get_shape_count(self) -> int:
+        """Returns the number of shapes in the summarized design hierarchy, counting shapes of every instance.
+
+        Returns:
+            (int): Number of shapes
+        """
+        return self._shape_count
+
+    def get_occupancy_grid(self) -> tuple:
+        """Returns the fraction of each grid cell covered by shapes.
+
+        Returns:
+            (Tuple[Tuple[float]]): GRID_SIZE rows of GRID_SIZE values. Row 0 is at y_min, column 0 at x_min
+        """
+        return self._grid
+
+    def get_cell_box(self, row: int, column: int) -> tuple:
+        """Returns the area covered by a grid cell.
+
+        Args:
+            row (int): row of the cell
+            column (int): column of the cell
+
+        Returns:
+            (Tuple[float]): (x_min, y_min, x_max, y_max) relative to the design's origin
+        """
+        cell_width = (self._bbox[2] - self._bbox[0]) / GRID_SIZE
+        cell_height = (self._bbox[3] - self._bbox[1]) / GRID_SIZE
+        x_min = self._bbox[0] + column * cell_width
+        y_min = self._bbox[1] + row * cell_height
+        return (x_min, y_min, x_min + cell_width, y_min + cell_height)
+
+
+def build_summary(bbox: tuple, shape_boxes: List[tuple], placed_summaries: List[tuple]) -> LodSummary:
+    """Builds the summary of a design from its own shapes and the summaries of its instances.
+
+       Shapes add their overlap with each cell to the cell's covered area.
+       The covered area of each cell of an instance's summary is spread over the cells it overlaps,
+       assuming it is uniformly distributed within the cell. This keeps the cost per design proportional to
+       the number of its own shapes and instances, regardless of how many shapes the instances contain.
+
+    Args:
+        bbox (Tuple[int]): bounding box of the design
+        shape_boxes (List[Tuple[int]]): bounding boxes of the design's own shapes
+        placed_summaries (List[Tuple]): (x_offset, y_offset, LodSummary) for every instance
+
+    Returns:
+        (LodSummary): Summary of the design.
+    """
+    covered = [[0.0] * GRID_SIZE for _ in range(GRID_SIZE)]
+    shape_count = len(shape_boxes)
+
+    for shape_box in shape_boxes:
+        _spread(covered, bbox, shape_box, _box_area(shape_box))
+
+    for x_offset, y_offset, summary in placed_summaries:
+        shape_count += summary._shape_count
+        for row in range(GRID_SIZE):
+            for column in range(GRID_SIZE):
+                occupancy = summary._grid[row][column]
+                if occupancy > 0.0:
+                    x_min, y_min, x_max, y_max = summary.get_cell_box(row, column)
+                    cell_box = (x_min + x_offset, y_min + y_offset, x_max + x_offset, y_max + y_offset)
+                    _spread(covered, bbox, cell_box, occupancy * _box_area(cell_box))
+
+    cell_area = _box_area(bbox) / (GRID_SIZE * GRID_SIZE)
+    grid = [[min(area / cell_area, 1.0) for area in row] for row in covered]
+    return LodSummary(bbox, shape_count, grid)
+
+
+def _spread(covered: List[List[float]], bbox: tuple, box: tuple, area: float) -> None:
+    """Adds area to the cells overlapped by box, in proportion to the overlap."""
+    box_area = _box_area(box)
+    if area <= 0.0 or box_area <= 0.0:
+        return
+
+    cell_width = (bbox[2] - bbox[0]) / GRID_SIZE
+    cell_height = (bbox[3] - bbox[1]) / GRID_SIZE
+    first_column, last_column = _cell_range(box[0], box[2], bbox[0], cell_width)
+    first_row, last_row = _cell_range(box[1], box[3], bbox[1], cell_height)
+
+    for row in range(first_row, last_row + 1):
+        cell_y_min = bbox[1] + row * cell_height
+        overlap_y = min(box[3], cell_y_min + cell_height) - max(box[1], cell_y_min)
+        if overlap_y <= 0:
+            continue
+        for column in range(first_column, last_column + 1):
+            cell_x_min = bbox[0] + column * cell_width
+            overlap_x = min(box[2], cell_x_min + cell_width) - max(box[0], cell_x_min)
+            if overlap_x > 0:
+                covered[row][column] += area * overlap_x * overlap_y / box_area
+
+
+def _cell_range(low: float, high: float, origin: float, cell_size: float) -> tuple:
+    """Returns the first and last cell index covering the interval [low, high) along one axis."""
+    first = int(math.floor((low - origin) / cell_size))
+    last = int(math.ceil((high - origin) / cell_size)) - 1
+    return max(first, 0), min(last, GRID_SIZE - 1)
+
+
+def _box_area(box: tuple) -> float:
+    """Returns the area of a bounding box (x_min, y_min, x_max, y_max)."""
+    return (box[2] - box[0]) * (box[3] - box[1])
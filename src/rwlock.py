@@ -0,0 +1,150 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    A ReadWriteLock lets many threads read at the same time, while a writing thread has exclusive access.
+
+    The lock prefers writers: once a writer is waiting, new readers wait until it is done, so a steady stream of
+    queries cannot starve edits. Both modes are re-entrant for the thread holding them, and a thread holding the
+    write lock may also read. A thread holding only the read lock cannot upgrade to the write lock, because two
+    readers upgrading at the same time would wait for each other forever. Doing so raises RuntimeError.
+
+    Attributes:
+        self._condition (threading.Condition): Guards the counters below and wakes up waiting threads
+        self._readers (int): Number of threads holding the read lock
+        self._writer (threading.Thread): Thread holding the write lock, or None
+        self._waiting_writers (int): Number of threads waiting for the write lock
+        self._local (threading.local): Per-thread read and write nesting depths
+
+    Methods:
+        def reading(self):
+            Context manager holding the read lock.
+
+        def writing(self):
+            Context manager holding the write lock.
+    """
+
+    def __init__(self):
+        """Initializes an unlocked lock."""
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def reading(self):
+        """Context manager holding the read lock. Waits while another thread holds or waits for the write lock."""
+        local = self._local
+        if getattr(local, 'write_depth', 0) or getattr(local, 'read_depth', 0):
+            local.read_depth = getattr(local, 'read_depth', 0) + 1
+            try:
+                yield
+            finally:
+                local.read_depth -= 1
+            return
+
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        local.read_depth = 1
+        try:
+            yield
+        finally:
+            local.read_depth = 0
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        """Context manager holding the write lock. Waits until no other thread reads or writes.
+
+        Raises:
+            RuntimeError: Raised if the thread holds the read lock but not the write lock
+        """
+        local = self._local
+        if getattr(local, 'write_depth', 0):
+            local.write_depth += 1
+            try:
+                yield
+            finally:
+                local.write_depth -= 1
+            return
+        if getattr(local, 'read_depth', 0):
+            error_message = 'cannot acquire the write lock while holding the read lock'
+            print(error_message)
+            raise RuntimeError(error_message)
+
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = threading.current_thread()
+        local.write_depth = 1
+        try:
+            yield
+        finally:
+            local.write_depth = 0
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+
+design_lock = ReadWriteLock()
+"""Lock shared by all designs, shapes and instances.
+
+   Designs embed each other and edits invalidate cached results of every enclosing design,
+   so a single lock guards the whole hierarchy. Hold design_lock.writing() to apply several edits atomically,
+   or design_lock.reading() to run several queries against the same state of the designs.
+"""
+
+
+def read_locked(method):
+    """Decorator running a method while holding the read lock of design_lock."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with design_lock.reading():
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def write_locked(method):
+    """Decorator running a method while holding the write lock of design_lock."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with design_lock.writing():
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def read_locked_if_owned(method):
+    """Decorator holding the read lock of design_lock while running a method of a shape or instance that belongs to a design.
+       Objects that do not belong to a design (e.g. copies returned by queries) are not shared, so they are not locked.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._owner is None:
+            return method(self, *args, **kwargs)
+        with design_lock.reading():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def write_locked_if_owned(method):
+    """Decorator holding the write lock of design_lock while running a method of a shape or instance that belongs to a design.
+       Objects that do not belong to a design (e.g. copies returned by queries) are not shared, so they are not locked.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._owner is None:
+            return method(self, *args, **kwargs)
+        with design_lock.writing():
+            return method(self, *args, **kwargs)
+    return wrapper
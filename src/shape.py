@@ -1,17 +1,22 @@
+import src.rwlock
+
 
 class Shape:
     """
     A Shape instance represents a rectangle lying within a parent(enclosing) design.
+    Shapes that belong to a design hold src.rwlock.design_lock while they are read or edited.
 
     Attributes:
         _x_offset (int): x offset with respect to the origin (0,0) of the enclosing design
         _y_offset (int): y offset with respect to the origin (0,0) of the enclosing design
         _width (int): width of rectangle
         _height (int): height of rectangle
+        _layer (int): layer the rectangle is drawn on
+        _owner (Design): design the shape belongs to, or None. The owner is notified whenever the shape changes.
 
     Methods:
-        def __init__(self, x_offset: int, y_offset: int, width: int, height: int):
-            Initializes offset and dimensions.
+        def __init__(self, x_offset: int, y_offset: int, width: int, height: int, layer: int = 0):
+            Initializes offset, dimensions and layer.
 
         def set_offset(self, x_offset: int, y_offset: int) -> None:
             Sets the offset with respect to origin of the parent Design.
@@ -19,29 +24,43 @@ class Shape:
         def set_dimensions(self, width: int, height: int) -> None:
             Sets the width  of the rectangle.
 
+        def set_layer(self, layer: int) -> None:
+            Sets the layer the rectangle is drawn on.
+
+        def get_layer(self) -> int:
+            Returns the layer the rectangle is drawn on.
+
         def get_area(self) -> int:
             Returns area of the rectangle.
 
         def get_offset(self) -> int:
             Returns offset with respect to parent Design.
+
+        def get_bounding_box(self) -> Tuple[int]:
+            Returns the corners of the rectangle with respect to parent Design.
     """
 
-    def __init__(self, x_offset: int, y_offset: int, width: int, height: int):
-        """Initializes offset and dimensions.
+    def __init__(self, x_offset: int, y_offset: int, width: int, height: int, layer: int = 0):
+        """Initializes offset, dimensions and layer.
 
         Args:
             x_offset (int): x offset with respect to the origin (0,0) of the enclosing design
             y_offset (int): y offset with respect to the origin (0,0) of the enclosing design
             width (int): Width of rectangle. Must be a positive integer
             height (int): height of rectangle. Must be a positive integer
+            layer (int): layer the rectangle is drawn on
 
         Raises:
             TypeError: Inputs must be of integer type, else type error is raised.
             ValueError: Width and height must be positive integers, else ValueError is raised.
         """
+        self._owner = None
+        self._layer = None
         self.set_offsets(x_offset, y_offset)
         self.set_dimensions(width, height)
+        self.set_layer(layer)
 
+    @src.rwlock.write_locked_if_owned
     def set_offsets(self, x_offset: int, y_offset: int) -> None:
         """Sets the offset with respect to the origin (0, 0) of the enclosing(parent) design
 
@@ -59,7 +78,9 @@ class Shape:
 
         self._x_offset = x_offset
         self._y_offset = y_offset
+        self._notify_owner()
 
+    @src.rwlock.write_locked_if_owned
     def shift_offsets(self, x_offset_delta: int, y_offset_delta: int) -> None:
         """Shifts the shape's current x and y offsets by the specified distances.
 
@@ -77,7 +98,9 @@ class Shape:
 
         self._x_offset += x_offset_delta
         self._y_offset += y_offset_delta
+        self._notify_owner()
 
+    @src.rwlock.write_locked_if_owned
     def set_dimensions(self, width: int, height: int) -> None:
         """Sets the height and width of the rectangle.
 
@@ -98,9 +121,43 @@ class Shape:
             print(error_message)
             raise ValueError(error_message)
 
+        if self._owner is not None:
+            self._owner._update_layer_stats(self._layer, 0, width * height - self._width * self._height)
         self._width = width
         self._height = height
+        self._notify_owner()
+
+    @src.rwlock.write_locked_if_owned
+    def set_layer(self, layer: int) -> None:
+        """Sets the layer the rectangle is drawn on.
+           If the shape belongs to a design, it is moved to the design's partition for the new layer.
+
+        Args:
+            layer (int): layer the rectangle is drawn on
+
+        Raises:
+            TypeError: Raised if layer is not an integer
+        """
+        if not isinstance(layer, int):
+            error_message = 'layer must be an integer'
+            print(error_message)
+            raise TypeError(error_message)
+
+        old_layer = self._layer
+        self._layer = layer
+        if self._owner is not None and old_layer != layer:
+            self._owner._move_shape_layer(self, old_layer)
+
+    @src.rwlock.read_locked_if_owned
+    def get_layer(self) -> int:
+        """Returns the layer the rectangle is drawn on.
 
+        Returns:
+            (int): layer of the shape
+        """
+        return self._layer
+
+    @src.rwlock.read_locked_if_owned
     def get_offsets(self) -> int:
         """Returns offset with respect to parent Design
 
@@ -109,6 +166,7 @@ class Shape:
         """
         return (self._x_offset, self._y_offset)
 
+    @src.rwlock.read_locked_if_owned
     def get_dimensions(self) -> int:
         """Returns dimensions of a shape.
 
@@ -117,6 +175,7 @@ class Shape:
         """
         return (self._width, self._height)
 
+    @src.rwlock.read_locked_if_owned
     def get_area(self) -> int:
         """Returns area of a shape
 
@@ -125,6 +184,34 @@ class Shape:
         """
         return self._width * self._height
 
+    @src.rwlock.read_locked_if_owned
+    def get_bounding_box(self) -> tuple:
+        """Returns the lower-left and upper-right corners of the rectangle with respect to parent Design
+
+        Returns:
+            (Tuple[int]): (x_min, y_min, x_max, y_max)
+        """
+        return (self._x_offset, self._y_offset, self._x_offset + self._width, self._y_offset + self._height)
+
+    def _get_key(self) -> tuple:
+        """Returns a hashable tuple describing the shape's location and dimensions.
+
+        Returns:
+            (Tuple[int]): (x_offset, y_offset, width, height, layer)
+        """
+        return (self._x_offset, self._y_offset, self._width, self._height, self._layer)
+
+    def _notify_owner(self) -> None:
+        """Tells the owning design (if any) that the shape has changed, so cached results of the design are dropped."""
+        if self._owner is not None:
+            self._owner._invalidate()
+
+    def __getstate__(self) -> dict:
+        """Returns the state used for copying and pickling. The owner is not copied along with the shape."""
+        state = self.__dict__.copy()
+        state['_owner'] = None
+        return state
+
     def __eq__(self, other) -> bool:
         """Checks if two shapes are equal.
 
@@ -132,13 +219,14 @@ class Shape:
             other (Shape): shape to compare against
 
         Returns:
-            (bool): True if the two shapes have same dimensions and offset from parent.
+            (bool): True if the two shapes have same dimensions, offset from parent and layer.
         """
         return self._x_offset == other._x_offset and \
             self._y_offset == other._y_offset and \
             self._width == other._width and \
-            self._height == other._height
+            self._height == other._height and \
+            self._layer == other._layer
 
     def __str__(self) -> str:
         """Returns string value """
-        return f'x_offset:{self._x_offset}, y_offset:{self._y_offset}, w:{self._width}, h:{self._height}'
+        return f'x_offset:{self._x_offset}, y_offset:{self._y_offset}, w:{self._width}, h:{self._height}, layer:{self._layer}'
@@ -0,0 +1,149 @@
+import math
+from typing import List
+
+
+class SpatialIndex:
+    """
+    A SpatialIndex is a static tree of bounding boxes used to answer spatial queries without scanning every entry.
+
+    Entries are (bounding_box, item) pairs, where a bounding box is a tuple (x_min, y_min, x_max, y_max).
+    The tree is bulk-loaded with the Sort-Tile-Recursive (STR) method: entries are sorted into vertical slices by
+    x center, each slice is sorted by y center, and runs of node_capacity entries become leaf nodes.
+    The same packing is repeated on the nodes until a single root node remains.
+    The index does not support insertion or deletion. It is rebuilt when the design it describes changes.
+
+    Attributes:
+        self._root (SpatialIndexNode): Root node of the tree, or None if the index is empty
+
+    Methods:
+        def __init__(self, entries: List[Tuple], node_capacity: int = 16):
+            Builds the tree from (bounding_box, item) pairs.
+
+        def get_root(self) -> SpatialIndexNode:
+            Returns the root node of the tree, or None if the index is empty.
+
+        def intersecting(self, bbox: Tuple[int]) -> Iterator[SpatialIndexNode]:
+            Yields the entries whose bounding box overlaps the given bounding box.
+    """
+
+    def __init__(self, entries: List[tuple], node_capacity: int = 16):
+        """Builds the tree from (bounding_box, item) pairs.
+
+        Args:
+            entries (List[Tuple]): (bounding_box, item) pairs to index
+            node_capacity (int): Maximum number of children of a node. Must be at least 2
+        """
+        if not entries:
+            self._root = None
+            return
+
+        nodes = [SpatialIndexNode(bbox, item, True) for bbox, item in entries]
+        while True:
+            nodes = self._pack(nodes, node_capacity)
+            if len(nodes) == 1:
+                break
+        self._root = nodes[0]
+
+    def get_root(self):
+        """Returns the root node of the tree, or None if the index is empty.
+
+        Returns:
+            (SpatialIndexNode): Root node of the tree.
+        """
+        return self._root
+
+    def intersecting(self, bbox: tuple):
+        """Yields the entries whose bounding box overlaps the given bounding box.
+           Boxes that only touch along an edge or at a corner do not overlap.
+           Subtrees whose bounding box does not overlap are skipped without visiting their entries.
+
+        Args:
+            bbox (Tuple[int]): (x_min, y_min, x_max, y_max)
+
+        Yields:
+            (SpatialIndexNode): Entry nodes whose bounding box overlaps bbox.
+        """
+        pending = [self._root] if self._root is not None else []
+        while pending:
+            node = pending.pop()
+            if not boxes_overlap(node.bbox, bbox):
+                continue
+            if node.is_entry:
+                yield node
+            else:
+                pending.extend(node.content)
+
+    @staticmethod
+    def _pack(nodes: list, node_capacity: int) -> list:
+        """Groups nodes into parent nodes of at most node_capacity children, using Sort-Tile-Recursive packing."""
+        parent_count = math.ceil(len(nodes) / node_capacity)
+        slice_count = math.ceil(math.sqrt(parent_count))
+        slice_size = slice_count * node_capacity
+
+        nodes = sorted(nodes, key=lambda node: node.bbox[0] + node.bbox[2])
+        parents = []
+        for slice_start in range(0, len(nodes), slice_size):
+            vertical_slice = sorted(nodes[slice_start:slice_start + slice_size], key=lambda node: node.bbox[1] + node.bbox[3])
+            for start in range(0, len(vertical_slice), node_capacity):
+                children = vertical_slice[start:start + node_capacity]
+                parents.append(SpatialIndexNode(bounding_box_union(child.bbox for child in children), children, False))
+        return parents
+
+
+class SpatialIndexNode:
+    """
+    A node of a SpatialIndex.
+
+    Attributes:
+        bbox (Tuple[int]): Bounding box (x_min, y_min, x_max, y_max) enclosing everything below the node
+        content: The indexed item if the node is an entry, else the list of child nodes
+        is_entry (bool): True if the node holds an indexed item
+    """
+
+    __slots__ = ('bbox', 'content', 'is_entry')
+
+    def __init__(self, bbox: tuple, content, is_entry: bool):
+        """Initializes the bounding box and content of the node."""
+        self.bbox = bbox
+        self.content = content
+        self.is_entry = is_entry
+
+
+def bounding_box_union(bboxes) -> tuple:
+    """Returns the smallest bounding box enclosing all given bounding boxes, or None if there are none.
+
+    Args:
+        bboxes (Iterable[Tuple[int]]): bounding boxes (x_min, y_min, x_max, y_max)
+
+    Returns:
+        (Tuple[int]): (x_min, y_min, x_max, y_max)
+    """
+    x_min = y_min = math.inf
+    x_max = y_max = -math.inf
+    for bbox in bboxes:
+        x_min = min(x_min, bbox[0])
+        y_min = min(y_min, bbox[1])
+        x_max = max(x_max, bbox[2])
+        y_max = max(y_max, bbox[3])
+    if x_min == math.inf:
+        return None
+    return (x_min, y_min, x_max, y_max)
+
+
+def boxes_overlap(bbox_a: tuple, bbox_b: tuple) -> bool:
+    """Returns True if two bounding boxes overlap with a positive area."""
+    return bbox_a[0] < bbox_b[2] and bbox_b[0] < bbox_a[2] and bbox_a[1] < bbox_b[3] and bbox_b[1] < bbox_a[3]
+
+
+def box_contains(outer: tuple, inner: tuple) -> bool:
+    """Returns True if the bounding box inner lies completely inside the bounding box outer."""
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and inner[2] <= outer[2] and inner[3] <= outer[3]
+
+
+def squared_distance_to_box(x: int, y: int, bbox: tuple, x_shift: int = 0, y_shift: int = 0) -> int:
+    """Returns the squared euclidean distance from a point to a bounding box shifted by the given offsets.
+       The distance is 0 if the point lies inside the box.
+    """
+    dx = max(bbox[0] + x_shift - x, 0, x - bbox[2] - x_shift)
+    dy = max(bbox[1] + y_shift - y, 0, y - bbox[3] - y_shift)
+    return dx * dx + dy * dy
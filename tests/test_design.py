@@ -1,5 +1,8 @@
+import gc
 import pytest
+import random
 from collections import Counter
+from copy import deepcopy
 from src.shape import Shape
 from src.design import Design
 from src.instance import Instance
@@ -292,3 +295,395 @@ def test_get_shapes_within_one_level_no_side_effects():
     assert len(shifted_shapes) == 2
     assert s1.get_offsets() == (x_offset_s1, y_offset_s1)
     assert s2.get_offsets() == (x_offset_s2, y_offset_s2)
+
+
+def test_discarded_parent_drops_out_of_hierarchy():
+    """Designs that embed a design are only held weakly by it, so discarded designs are garbage collected."""
+    design_embedded = Design()
+    design_embedded.add_shape(0, 0, 1, 1)
+    design_top = Design()
+    design_top.add_instance(3, 3, design_embedded)
+    for _ in range(10):
+        Design().add_instance(0, 0, design_embedded)
+    gc.collect()
+    assert list(design_embedded._parents) == [design_top]
+
+
+def test_deepcopy_keeps_hierarchy_links():
+    """Copying a design does not copy the designs embedding it, and edits in a copied hierarchy update the copy only."""
+    design_embedded = Design()
+    design_embedded.add_shape(0, 0, 1, 1)
+    design_top = Design()
+    design_top.add_instance(3, 3, design_embedded)
+
+    design_embedded_copy = deepcopy(design_embedded)
+    assert len(design_embedded_copy._parents) == 0
+
+    design_top_copy = deepcopy(design_top)
+    old_hash = design_top.get_content_hash()
+    assert design_top_copy.get_content_hash() == old_hash
+    design_top_copy.get_instances()[0].get_design_ref().get_shapes()[0].shift_offsets(1, 0)
+    assert design_top_copy.get_content_hash() != old_hash
+    assert design_top.get_content_hash() == old_hash
+
+
+def test_get_bounding_box():
+    """Design.get_bounding_box() encloses the design's shapes and the shapes of its embedded designs.
+       It returns None for a design without shapes, and is updated when an embedded shape is edited.
+    """
+    design_embedded = Design()
+    assert design_embedded.get_bounding_box() is None
+    shape = design_embedded.add_shape(0, 0, 5, 5)
+
+    design_top = Design()
+    design_top.add_shape(-1, -2, 1, 1)
+    design_top.add_instance(10, 10, design_embedded)
+    assert design_top.get_bounding_box() == (-1, -2, 15, 15)
+
+    shape.set_dimensions(10, 1)
+    assert design_top.get_bounding_box() == (-1, -2, 20, 11)
+
+
+def test_nearest_shapes_on_empty_design():
+    """Design.nearest_shapes() returns an empty list if there are no shapes in the design hierarchy."""
+    design_top = Design()
+    design_top.add_instance(0, 0, Design())
+    assert design_top.nearest_shapes(0, 0, 3) == []
+
+
+def test_nearest_shapes_invalid_arguments():
+    """Design.nearest_shapes() raises TypeError for non-integer arguments and ValueError for invalid k or depth."""
+    design = Design()
+    with pytest.raises(TypeError):
+        design.nearest_shapes(0.5, 0)
+    with pytest.raises(ValueError):
+        design.nearest_shapes(0, 0, 0)
+    with pytest.raises(ValueError):
+        design.nearest_shapes(0, 0, 1, depth=-1)
+
+
+def test_nearest_shapes_through_instances():
+    """Design.nearest_shapes() finds shapes of embedded designs, with offsets relative to the top-level design."""
+    design_bottom = Design()
+    design_bottom.add_shape(0, 0, 1, 1)
+
+    design_mid = Design()
+    design_mid.add_instance(100, 0, design_bottom)
+
+    design_top = Design()
+    design_top.add_shape(0, 0, 1, 1)
+    design_top.add_instance(0, 100, design_mid)
+
+    nearest = design_top.nearest_shapes(100, 100, 2)
+    assert [shape.get_offsets() for shape in nearest] == [(100, 100), (0, 0)]
+    assert design_bottom.get_shapes()[0].get_offsets() == (0, 0)  # shapes in the design are not modified
+
+    assert [shape.get_offsets() for shape in design_top.nearest_shapes(100, 100, 2, depth=1)] == [(0, 0)]
+
+
+def test_nearest_shapes_matches_linear_scan():
+    """Design.nearest_shapes() returns the same distances as sorting all flattened shapes by distance."""
+    rng = random.Random(7)
+    design_leaf = Design()
+    for _ in range(50):
+        design_leaf.add_shape(rng.randint(0, 200), rng.randint(0, 200), rng.randint(1, 20), rng.randint(1, 20))
+    design_top = Design()
+    for _ in range(30):
+        design_top.add_shape(rng.randint(-500, 500), rng.randint(-500, 500), rng.randint(1, 20), rng.randint(1, 20))
+    for _ in range(10):
+        design_top.add_instance(rng.randint(-500, 500), rng.randint(-500, 500), design_leaf)
+
+    flattened = design_top.get_shapes_within_one_level()
+
+    def distance(shape, x, y):
+        x_min, y_min, x_max, y_max = shape.get_bounding_box()
+        dx, dy = max(x_min - x, 0, x - x_max), max(y_min - y, 0, y - y_max)
+        return dx * dx + dy * dy
+
+    for _ in range(20):
+        x, y = rng.randint(-600, 600), rng.randint(-600, 600)
+        expected = sorted(distance(shape, x, y) for shape in flattened)[:7]
+        assert [distance(shape, x, y) for shape in design_top.nearest_shapes(x, y, 7)] == expected
+
+
+def test_extract_window_invalid_arguments():
+    """Design.extract_window() raises TypeError for non-integer edges and ValueError for an empty window."""
+    design = Design()
+    with pytest.raises(TypeError):
+        design.extract_window(0, 0, 1.5, 1)
+    with pytest.raises(ValueError):
+        design.extract_window(0, 0, 0, 10)
+
+
+def test_extract_window_outside_design():
+    """Design.extract_window() returns an empty design if the window does not overlap the design."""
+    design = Design()
+    assert design.extract_window(0, 0, 10, 10).get_shapes() == []
+    design.add_shape(20, 20, 5, 5)
+    cropped = design.extract_window(0, 0, 10, 10)
+    assert cropped.get_shapes() == [] and cropped.get_instances() == []
+
+
+def test_extract_window_clips_shapes():
+    """Shapes crossing the window are clipped, shapes outside or only touching the window are dropped."""
+    design = Design()
+    design.add_shape(0, 0, 5, 5)     # inside
+    design.add_shape(8, 8, 5, 5)     # crosses the top-right corner
+    design.add_shape(10, 0, 5, 5)    # touches the right edge
+    design.add_shape(50, 50, 5, 5)   # outside
+
+    cropped = design.extract_window(0, 0, 10, 10)
+    cropped_shapes = sorted((shape.get_offsets(), shape.get_dimensions()) for shape in cropped.get_shapes())
+    assert cropped_shapes == [((0, 0), (5, 5)), ((8, 8), (2, 2))]
+    assert len(design.get_shapes()) == 4  # original design is not modified
+    assert design.get_shapes()[1].get_dimensions() == (5, 5)
+
+
+def test_extract_window_keeps_untouched_instances():
+    """Instances completely inside the window keep referring to their design.
+       Instances crossing the window refer to a cropped design, shared between instances cropped the same way.
+    """
+    design_cell = Design()
+    design_cell.add_shape(0, 0, 10, 10)
+
+    design_top = Design()
+    design_top.add_instance(0, 0, design_cell)     # inside
+    design_top.add_instance(20, 0, design_cell)    # crosses the right edge
+    design_top.add_instance(20, 20, design_cell)   # crosses the right edge the same way
+    design_top.add_instance(100, 0, design_cell)   # outside
+
+    cropped = design_top.extract_window(0, 0, 25, 40)
+    instances = sorted(cropped.get_instances(), key=lambda inst: inst.get_offsets())
+    assert [inst.get_offsets() for inst in instances] == [(0, 0), (20, 0), (20, 20)]
+    assert instances[0].get_design_ref() is design_cell
+    assert instances[1].get_design_ref() is not design_cell
+    assert instances[1].get_design_ref() is instances[2].get_design_ref()
+    assert [shape.get_dimensions() for shape in instances[1].get_design_ref().get_shapes()] == [(5, 10)]
+    assert design_cell.get_shapes()[0].get_dimensions() == (10, 10)
+
+
+def test_extract_window_matches_clipped_shapes():
+    """Shapes of the extracted design cover the same area as clipping every shape within one level."""
+    rng = random.Random(3)
+    design_cell = Design()
+    for _ in range(20):
+        design_cell.add_shape(rng.randint(0, 50), rng.randint(0, 50), rng.randint(1, 10), rng.randint(1, 10))
+    design_top = Design()
+    for _ in range(20):
+        design_top.add_shape(rng.randint(0, 300), rng.randint(0, 300), rng.randint(1, 30), rng.randint(1, 30))
+    for _ in range(10):
+        design_top.add_instance(rng.randint(0, 300), rng.randint(0, 300), design_cell)
+
+    window = (60, 80, 200, 170)
+    expected = Counter()
+    for shape in design_top.get_shapes_within_one_level():
+        x_min, y_min, x_max, y_max = shape.get_bounding_box()
+        x_min, y_min = max(x_min, window[0]), max(y_min, window[1])
+        x_max, y_max = min(x_max, window[2]), min(y_max, window[3])
+        if x_min < x_max and y_min < y_max:
+            expected[(x_min, y_min, x_max, y_max)] += 1
+
+    extracted = Counter(shape.get_bounding_box() for shape in design_top.extract_window(*window).get_shapes_within_one_level())
+    assert extracted == expected
+
+
+def test_extract_window_discarded_result_is_not_a_parent():
+    """Discarded window results do not stay linked to the designs they embed, so later edits do not revisit them."""
+    design_cell = Design()
+    shape = design_cell.add_shape(0, 0, 10, 10)
+    design_top = Design()
+    design_top.add_instance(0, 0, design_cell)
+
+    for _ in range(20):
+        design_top.extract_window(0, 0, 50, 50)
+    window = design_top.extract_window(0, 0, 50, 50)
+    gc.collect()
+    assert set(design_cell._parents) == {design_top, window}
+
+    del window
+    gc.collect()
+    assert list(design_cell._parents) == [design_top]
+    shape.set_offsets(1, 1)
+    assert design_top.get_bounding_box() == (1, 1, 11, 11)
+
+
+def test_get_shapes_for_view_invalid_arguments():
+    """Design.get_shapes_for_view() raises TypeError for invalid types and ValueError for invalid values."""
+    design = Design()
+    with pytest.raises(TypeError):
+        design.get_shapes_for_view(0, 0, 10, 10, "1")
+    with pytest.raises(ValueError):
+        design.get_shapes_for_view(0, 0, 10, 10, 0)
+
+
+def test_get_shapes_for_view_summarizes_small_instances():
+    """Instances smaller than min_size pixels on screen are returned as summaries instead of shapes."""
+    design_cell = Design()
+    design_cell.add_shape(0, 0, 10, 10)
+    design_cell.add_shape(10, 10, 10, 10)
+
+    design_top = Design()
+    design_top.add_shape(0, 0, 1, 1)
+    for i in range(10):
+        design_top.add_instance(100 * i, 0, design_cell)
+
+    shapes, summaries = design_top.get_shapes_for_view(0, 0, 1000, 100, 1.0, min_size=4)
+    assert len(shapes) == 21
+    assert summaries == []
+
+    shapes, summaries = design_top.get_shapes_for_view(0, 0, 1000, 100, 0.1, min_size=4)
+    assert [shape.get_offsets() for shape in shapes] == [(0, 0)]
+    assert sorted((x_offset, y_offset) for x_offset, y_offset, _ in summaries) == [(100 * i, 0) for i in range(10)]
+    assert all(summary is design_cell.get_lod_summary() for _, _, summary in summaries)
+
+
+def test_get_shapes_for_view_skips_shapes_outside_window():
+    """Shapes and instances outside the window are not returned."""
+    design_cell = Design()
+    design_cell.add_shape(0, 0, 10, 10)
+
+    design_top = Design()
+    design_top.add_instance(0, 0, design_cell)
+    design_top.add_instance(500, 0, design_cell)
+    design_top.add_shape(500, 500, 1, 1)
+
+    shapes, summaries = design_top.get_shapes_for_view(-5, -5, 20, 20, 1.0)
+    assert [shape.get_offsets() for shape in shapes] == [(0, 0)]
+    assert summaries == []
+
+
+def test_get_shapes_by_layer():
+    """Design.get_shapes() only returns shapes on the given layer. Without a layer, shapes are grouped by layer."""
+    design = Design()
+    shape_1 = design.add_shape(0, 0, 1, 1, layer=2)
+    shape_2 = design.add_shape(0, 0, 2, 2, layer=1)
+    shape_3 = design.add_shape(0, 0, 3, 3, layer=2)
+    assert design.get_shapes(2) == [shape_1, shape_3]
+    assert design.get_shapes(7) == []
+    assert design.get_shapes() == [shape_2, shape_1, shape_3]
+    assert design.get_shapes_inorder_of_descending_area(2) == [shape_3, shape_1]
+    assert design.get_layers() == {1, 2}
+
+
+def test_set_layer_moves_shape_between_partitions():
+    """Changing the layer of a shape in a design moves it to the partition of the new layer."""
+    design = Design()
+    shape_1 = design.add_shape(0, 0, 1, 1, layer=1)
+    shape_2 = Shape(0, 0, 1, 1, layer=1)
+    shape_2 = design.add_shape_copy(shape_2)  # equal to shape_1, but a different shape object
+    shape_2.set_layer(3)
+    assert design.get_shapes(1) == [shape_1] and design.get_shapes(1)[0] is shape_1
+    assert design.get_shapes(3)[0] is shape_2
+    shape_1.set_layer(3)
+    assert design.get_layers() == {3}
+
+
+def test_hierarchy_queries_by_layer():
+    """Hierarchy walks restricted to a layer only see shapes on that layer."""
+    design_cell = Design()
+    design_cell.add_shape(0, 0, 1, 1, layer=1)
+    design_cell.add_shape(5, 5, 1, 1, layer=2)
+
+    design_top = Design()
+    design_top.add_shape(100, 100, 10, 10, layer=2)
+    design_top.add_instance(10, 10, design_cell)
+    design_top.add_instance(50, 50, Design())
+
+    assert design_top.get_layers() == {1, 2}
+    assert design_top.get_bounding_box(1) == (10, 10, 11, 11)
+    assert design_top.get_bounding_box(2) == (15, 15, 110, 110)
+    assert design_top.get_bounding_box(3) is None
+    assert [shape.get_offsets() for shape in design_top.get_shapes_within_one_level(2)] == [(100, 100), (15, 15)]
+    assert [shape.get_offsets() for shape in design_top.nearest_shapes(100, 100, 5, layer=1)] == [(10, 10)]
+    assert design_top.get_lod_summary(2).get_shape_count() == 2
+    shapes, _ = design_top.get_shapes_for_view(0, 0, 200, 200, 1.0, min_size=0, layer=1)
+    assert [shape.get_offsets() for shape in shapes] == [(10, 10)]
+
+
+def test_extract_window_by_layer():
+    """Design.extract_window() with a layer only keeps shapes on that layer.
+       Instances inside the window keep their design only if all its shapes are on the layer.
+    """
+    design_single_layer = Design()
+    design_single_layer.add_shape(0, 0, 1, 1, layer=1)
+    design_mixed = Design()
+    design_mixed.add_shape(0, 0, 1, 1, layer=1)
+    design_mixed.add_shape(2, 2, 1, 1, layer=2)
+
+    design_top = Design()
+    design_top.add_instance(0, 0, design_single_layer)
+    design_top.add_instance(10, 0, design_mixed)
+
+    cropped = design_top.extract_window(-5, -5, 50, 50, layer=1)
+    instances = sorted(cropped.get_instances(), key=lambda inst: inst.get_offsets())
+    assert instances[0].get_design_ref() is design_single_layer
+    assert instances[1].get_design_ref() is not design_mixed
+    assert cropped.get_layers() == {1}
+    assert sorted(shape.get_offsets() for shape in cropped.get_shapes_within_one_level()) == [(0, 0), (10, 0)]
+
+
+def test_stats_on_empty_design():
+    """Design.stats() returns zero shapes and zero area for an empty design."""
+    assert Design().stats() == (0, 0)
+
+
+def test_stats_multiplies_by_instance_count():
+    """Shapes of embedded designs are counted once per instance, through every level of the hierarchy."""
+    design_bottom = Design()
+    design_bottom.add_shape(0, 0, 2, 3)
+    design_bottom.add_shape(0, 0, 1, 1, layer=1)
+
+    design_mid = Design()
+    design_mid.add_shape(0, 0, 10, 10)
+    for i in range(3):
+        design_mid.add_instance(10 * i, 0, design_bottom)
+
+    design_top = Design()
+    design_top.add_instance(0, 0, design_mid)
+    design_top.add_instance(100, 0, design_mid)
+
+    assert design_top.stats() == (2 * (1 + 3 * 2), 2 * (100 + 3 * (6 + 1)))
+    assert design_top.stats(1) == (6, 6)
+    assert design_top.stats(5) == (0, 0)
+
+
+def test_stats_updated_on_edit():
+    """Design.stats() reflects shapes added, resized, moved between layers, and instances re-targeted."""
+    design_cell = Design()
+    shape = design_cell.add_shape(0, 0, 2, 2)
+    design_other = Design()
+    design_other.add_shape(0, 0, 5, 5)
+
+    design_top = Design()
+    inst = design_top.add_instance(0, 0, design_cell)
+    design_top.add_instance(5, 5, design_cell)
+    assert design_top.stats() == (2, 8)
+
+    shape.set_dimensions(3, 3)
+    assert design_top.stats() == (2, 18)
+
+    shape.set_layer(4)
+    assert design_top.stats(0) == (0, 0)
+    assert design_top.stats(4) == (2, 18)
+
+    design_cell.add_shape(0, 0, 1, 1)
+    assert design_top.stats() == (4, 20)
+
+    inst.set_design_ref(design_other)
+    assert design_top.stats() == (3, 35)
+
+
+def test_stats_matches_flattened_shapes():
+    """Design.stats() matches counting the shapes within one level of a two level hierarchy."""
+    rng = random.Random(11)
+    design_cell = Design()
+    for _ in range(40):
+        design_cell.add_shape(rng.randint(0, 50), rng.randint(0, 50), rng.randint(1, 10), rng.randint(1, 10))
+    design_top = Design()
+    for _ in range(25):
+        design_top.add_shape(rng.randint(0, 300), rng.randint(0, 300), rng.randint(1, 30), rng.randint(1, 30))
+    for _ in range(7):
+        design_top.add_instance(rng.randint(0, 300), rng.randint(0, 300), design_cell)
+
+    flattened = design_top.get_shapes_within_one_level()
+    assert design_top.stats() == (len(flattened), sum(shape.get_area() for shape in flattened))
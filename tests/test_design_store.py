@@ -0,0 +1,233 @@
+import gc
+import pytest
+from src.design import Design
+from src.design_store import DesignStore
+
+
+def _make_hierarchy():
+    """Returns a top-level design with two instances of a leaf design and one instance of a second leaf design."""
+    design_leaf_1 = Design()
+    design_leaf_1.add_shape(0, 0, 2, 2)
+    design_leaf_1.add_shape(5, 5, 1, 1, layer=1)
+    design_leaf_2 = Design()
+    design_leaf_2.add_shape(0, 0, 3, 4)
+
+    design_top = Design()
+    design_top.add_shape(0, 0, 1, 1)
+    design_top.add_instance(10, 0, design_leaf_1)
+    design_top.add_instance(20, 0, design_leaf_1)
+    design_top.add_instance(100, 100, design_leaf_2)
+    return design_top
+
+
+def test_round_trip(tmp_path):
+    """A loaded design has the same content, bounding boxes and stats as the saved design."""
+    design_top = _make_hierarchy()
+    store = DesignStore(str(tmp_path / 'store'))
+    key = store.save(design_top)
+    store.close()
+
+    store = DesignStore(str(tmp_path / 'store'))
+    lazy_top = store.load(key)
+    assert lazy_top.get_content_hash() == design_top.get_content_hash()
+    assert lazy_top.get_bounding_box() == design_top.get_bounding_box()
+    assert lazy_top.get_bounding_box(1) == design_top.get_bounding_box(1)
+    assert lazy_top.stats() == design_top.stats()
+    assert lazy_top.get_layers() == design_top.get_layers()
+    assert lazy_top.get_shapes() == design_top.get_shapes()
+    assert sorted(shape._get_key() for shape in lazy_top.get_shapes_within_one_level()) == \
+        sorted(shape._get_key() for shape in design_top.get_shapes_within_one_level())
+    assert store.load(key) is lazy_top
+
+
+def test_shared_designs_are_stored_once(tmp_path):
+    """Instances of the same design refer to the same proxy after loading."""
+    store = DesignStore(str(tmp_path / 'store'))
+    lazy_top = store.load(store.save(_make_hierarchy()))
+    inst_1, inst_2, inst_3 = lazy_top.get_instances()
+    assert inst_1.get_design_ref() is inst_2.get_design_ref()
+    assert inst_1.get_design_ref() is not inst_3.get_design_ref()
+
+
+def test_summary_queries_do_not_load_shapes(tmp_path):
+    """Bounding boxes, stats and content hashes are answered from the stored summary."""
+    store = DesignStore(str(tmp_path / 'store'))
+    lazy_top = store.load(store.save(_make_hierarchy()))
+    assert lazy_top.get_bounding_box() == (0, 0, 103, 104)
+    assert lazy_top.stats() == (6, 23)
+    assert lazy_top.stats(1) == (2, 2)
+    lazy_top.get_content_hash()
+    assert store.get_loaded_count() == 0
+    assert not lazy_top.is_loaded()
+
+
+def test_region_query_loads_only_needed_designs(tmp_path):
+    """A window query loads the designs whose bounding boxes overlap the window, and no others."""
+    store = DesignStore(str(tmp_path / 'store'))
+    lazy_top = store.load(store.save(_make_hierarchy()))
+    [inst_1, _, inst_3] = lazy_top.get_instances()
+
+    window = lazy_top.extract_window(0, 0, 15, 15)
+    assert sorted(shape._get_key() for shape in window.get_shapes_within_one_level()) == \
+        [(0, 0, 1, 1, 0), (10, 0, 2, 2, 0)]
+    assert inst_1.get_design_ref().is_loaded()
+    assert not inst_3.get_design_ref().is_loaded()
+
+
+def test_cache_size_bounds_loaded_designs(tmp_path):
+    """At most cache_size designs are loaded at a time, and evicted designs are loaded again when needed."""
+    design_top = Design()
+    for i in range(10):
+        design_leaf = Design()
+        design_leaf.add_shape(0, 0, i + 1, 1)
+        design_top.add_instance(i * 20, 0, design_leaf)
+
+    store = DesignStore(str(tmp_path / 'store'), cache_size=3)
+    lazy_top = store.load(store.save(design_top))
+    for inst in lazy_top.get_instances():
+        inst.get_design_ref().get_shapes()
+        assert store.get_loaded_count() <= 3
+    assert lazy_top.stats() == design_top.stats()
+    assert sorted(shape._get_key() for shape in lazy_top.get_shapes_within_one_level()) == \
+        sorted(shape._get_key() for shape in design_top.get_shapes_within_one_level())
+    assert store.get_loaded_count() <= 3
+
+
+def test_edits_are_written_back_on_eviction(tmp_path):
+    """Edits of an evicted design are kept, and the summaries of the designs embedding it are updated."""
+    design_leaf = Design()
+    design_leaf.add_shape(0, 0, 1, 1)
+    design_other = Design()
+    design_other.add_shape(0, 0, 1, 1)
+    design_top = Design()
+    design_top.add_instance(0, 0, design_leaf)
+    design_top.add_instance(50, 50, design_other)
+
+    store = DesignStore(str(tmp_path / 'store'), cache_size=1)
+    key = store.save(design_top)
+    lazy_top = store.load(key)
+    lazy_leaf = lazy_top.get_instances()[0].get_design_ref()
+    lazy_other = lazy_top.get_instances()[1].get_design_ref()
+
+    lazy_leaf.add_shape(5, 5, 2, 2)
+    lazy_other.get_shapes()
+    assert not lazy_leaf.is_loaded()
+    assert lazy_leaf.get_bounding_box() == (0, 0, 7, 7)
+    assert lazy_top.stats() == (3, 6)
+    store.close()
+
+    store = DesignStore(str(tmp_path / 'store'))
+    lazy_top = store.load(key)
+    assert lazy_top.stats() == (3, 6)
+    assert lazy_top.get_bounding_box() == (0, 0, 51, 51)
+    assert store.get_loaded_count() == 0
+
+
+def test_lazy_design_embedded_in_design(tmp_path):
+    """Loaded designs can be embedded in designs kept in memory, and saved again without copying them."""
+    store = DesignStore(str(tmp_path / 'store'))
+    key = store.save(_make_hierarchy())
+    lazy_top = store.load(key)
+
+    design_new = Design()
+    design_new.add_instance(0, 0, lazy_top)
+    design_new.add_instance(1000, 0, lazy_top)
+    assert design_new.stats() == (12, 46)
+    assert store.get_loaded_count() == 0
+
+    new_key = store.save(design_new)
+    assert store.load(new_key).get_instances()[0].get_design_ref() is lazy_top
+
+
+def test_invalid_arguments(tmp_path):
+    """Invalid cache sizes, designs and keys raise errors."""
+    with pytest.raises(ValueError):
+        DesignStore(str(tmp_path / 'store'), cache_size=0)
+    store = DesignStore(str(tmp_path / 'store'))
+    with pytest.raises(TypeError):
+        store.save('design')
+    with pytest.raises(KeyError):
+        store.load('missing')
+
+
+def test_edits_through_shapes_held_across_eviction(tmp_path):
+    """Shapes and instances held by the caller while their design is evicted still belong to it, so edits are kept."""
+    design_cell = Design()
+    design_cell.add_shape(0, 0, 1, 1)
+    design_a = Design()
+    design_a.add_shape(0, 0, 1, 1)
+    design_a.add_shape(3, 3, 1, 1, layer=2)
+    design_a.add_instance(10, 10, design_cell)
+    design_b = Design()
+    design_b.add_shape(0, 0, 1, 1)
+
+    store = DesignStore(str(tmp_path / 'store'), cache_size=1)
+    lazy_a = store.load(store.save(design_a))
+    lazy_b = store.load(store.save(design_b))
+
+    shape = lazy_a.get_shapes()[0]
+    inst = lazy_a.get_instances()[0]
+    lazy_b.get_shapes()
+    assert not lazy_a.is_loaded()
+
+    shape.set_offsets(50, 50)
+    inst.set_offsets(20, 20)
+    lazy_b.get_shapes()
+    shape.set_layer(2)
+    assert shape in lazy_a.get_shapes(2)
+    assert lazy_a.get_instances()[0] is inst
+    assert lazy_a.get_bounding_box() == (3, 3, 51, 51)
+    key = lazy_a.get_key()
+    store.close()
+
+    store = DesignStore(str(tmp_path / 'store'))
+    lazy_a = store.load(key)
+    assert sorted(shape._get_key() for shape in lazy_a.get_shapes()) == [(3, 3, 1, 1, 2), (50, 50, 1, 1, 2)]
+    assert lazy_a.get_instances()[0].get_offsets() == (20, 20)
+
+
+def test_edits_kept_after_dropping_shapes_held_across_eviction(tmp_path):
+    """Edits through shapes and instances held across an eviction are written back, even if they are dropped before sync()."""
+    design_cell = Design()
+    design_cell.add_shape(0, 0, 1, 1)
+    design_a = Design()
+    design_a.add_shape(0, 0, 1, 1)
+    design_a.add_instance(10, 10, design_cell)
+    design_b = Design()
+    design_b.add_shape(0, 0, 1, 1)
+
+    store = DesignStore(str(tmp_path / 'store'), cache_size=1)
+    lazy_a = store.load(store.save(design_a))
+    lazy_b = store.load(store.save(design_b))
+    key = lazy_a.get_key()
+
+    shape = lazy_a.get_shapes()[0]
+    inst = lazy_a.get_instances()[0]
+    lazy_b.get_shapes()
+    assert not lazy_a.is_loaded()
+    shape.set_dimensions(5, 5)
+    inst.set_offsets(20, 20)
+    del shape, inst
+    gc.collect()
+    store.close()
+
+    store = DesignStore(str(tmp_path / 'store'))
+    lazy_a = store.load(key)
+    assert lazy_a.stats() == (2, 26)
+    assert lazy_a.get_bounding_box() == (0, 0, 21, 21)
+    assert [shape._get_key() for shape in lazy_a.get_shapes()] == [(0, 0, 5, 5, 0)]
+    assert lazy_a.get_instances()[0].get_offsets() == (20, 20)
+
+
+def test_eviction_does_not_clear_cache_in_use(tmp_path):
+    """Evicting a design replaces its cache, so readers still filling in the old cache are unaffected."""
+    store = DesignStore(str(tmp_path / 'store'), cache_size=1)
+    lazy_top = store.load(store.save(_make_hierarchy()))
+    lazy_top.nearest_shapes(0, 0)
+    cache = lazy_top._cache
+    cached_keys = set(cache)
+
+    lazy_top.get_instances()[2].get_design_ref().get_shapes()
+    assert not lazy_top.is_loaded()
+    assert set(cache) == cached_keys
+    assert lazy_top._cache is not cache
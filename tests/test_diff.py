@@ -0,0 +1,146 @@
+from src.design import Design
+from src.diff import diff_designs
+
+
+def test_content_hash_ignores_insertion_order():
+    """Designs with the same shapes and instances have equal content hashes, regardless of insertion order."""
+    design_embedded = Design()
+    design_embedded.add_shape(0, 0, 1, 1)
+
+    design_1 = Design()
+    design_1.add_shape(0, 0, 5, 5)
+    design_1.add_shape(10, 10, 2, 2)
+    design_1.add_instance(3, 3, design_embedded)
+
+    design_2 = Design()
+    design_2.add_instance(3, 3, design_embedded)
+    design_2.add_shape(10, 10, 2, 2)
+    design_2.add_shape(0, 0, 5, 5)
+
+    assert design_1.get_content_hash() == design_2.get_content_hash()
+
+
+def test_content_hash_updated_on_nested_edit():
+    """Editing a shape of an embedded design changes the content hash of the enclosing design."""
+    design_embedded = Design()
+    shape = design_embedded.add_shape(0, 0, 1, 1)
+    design_top = Design()
+    design_top.add_instance(3, 3, design_embedded)
+
+    old_hash = design_top.get_content_hash()
+    shape.shift_offsets(1, 0)
+    assert design_top.get_content_hash() != old_hash
+    shape.shift_offsets(-1, 0)
+    assert design_top.get_content_hash() == old_hash
+
+
+def test_diff_identical_designs():
+    """Diffing two designs with the same content reports no changes."""
+    design_1, design_2 = Design(), Design()
+    design_1.add_shape(0, 0, 5, 5)
+    design_2.add_shape(0, 0, 5, 5)
+    assert diff_designs(design_1, design_2).is_empty()
+
+
+def test_diff_added_removed_and_moved_shapes():
+    """Shapes only in the old design are removed, only in the new design are added.
+       Shapes with the same dimensions at a different location are moved.
+    """
+    design_old = Design()
+    design_old.add_shape(0, 0, 5, 5)
+    design_old.add_shape(1, 1, 2, 2)
+    design_old.add_shape(7, 7, 3, 3)
+
+    design_new = Design()
+    design_new.add_shape(0, 0, 5, 5)
+    design_new.add_shape(4, 4, 2, 2)
+    design_new.add_shape(9, 9, 1, 8)
+
+    diff = diff_designs(design_old, design_new)
+    assert [(path, shape.get_offsets(), shape.get_dimensions()) for path, shape in diff.get_removed()] == [((), (7, 7), (3, 3))]
+    assert [(path, shape.get_offsets(), shape.get_dimensions()) for path, shape in diff.get_added()] == [((), (9, 9), (1, 8))]
+    [(old_path, old_shape, new_path, new_shape)] = diff.get_moved()
+    assert old_shape.get_offsets() == (1, 1)
+    assert new_shape.get_offsets() == (4, 4)
+
+
+def test_diff_reports_hierarchy_paths_and_top_level_offsets():
+    """Changes inside embedded designs are reported with the path of instances leading to them,
+       and with offsets relative to the top-level design.
+    """
+    design_bottom_old, design_bottom_new = Design(), Design()
+    design_bottom_old.add_shape(0, 0, 1, 1)
+    design_bottom_new.add_shape(0, 0, 1, 1)
+    design_bottom_new.add_shape(5, 5, 1, 2)
+
+    design_old, design_new = Design(), Design()
+    inst_old = design_old.add_instance(10, 20, design_bottom_old)
+    inst_new = design_new.add_instance(10, 20, design_bottom_new)
+
+    diff = diff_designs(design_old, design_new)
+    [(path, shape)] = diff.get_added()
+    assert path == (inst_new,)
+    assert shape.get_offsets() == (15, 25)
+    assert shape.get_dimensions() == (1, 2)
+    assert diff.get_removed() == []
+    assert diff.get_moved() == []
+    assert inst_old is not inst_new
+
+
+def test_diff_skips_identical_subtrees():
+    """Embedded designs with the same content are not compared shape by shape."""
+    design_shared = Design()
+    for i in range(100):
+        design_shared.add_shape(i, i, 1, 1)
+    design_copy = Design()
+    for i in reversed(range(100)):
+        design_copy.add_shape(i, i, 1, 1)
+
+    design_old, design_new = Design(), Design()
+    design_old.add_instance(0, 0, design_shared)
+    design_new.add_instance(0, 0, design_copy)
+    design_new.add_shape(500, 500, 1, 1)
+
+    diff = diff_designs(design_old, design_new)
+    assert [shape.get_offsets() for _, shape in diff.get_added()] == [(500, 500)]
+    assert diff.get_removed() == []
+
+
+def test_diff_moved_instance():
+    """All shapes of an instance placed at new offsets are reported as moved."""
+    design_embedded = Design()
+    design_embedded.add_shape(0, 0, 1, 1)
+    design_embedded.add_shape(2, 0, 1, 1)
+
+    design_old, design_new = Design(), Design()
+    design_old.add_instance(0, 0, design_embedded)
+    design_new.add_instance(100, 0, design_embedded)
+
+    diff = diff_designs(design_old, design_new)
+    moves = sorted((old.get_offsets(), new.get_offsets()) for _, old, _, new in diff.get_moved())
+    assert moves == [((0, 0), (100, 0)), ((2, 0), (102, 0))]
+    assert diff.get_added() == [] and diff.get_removed() == []
+
+
+def test_diff_removed_instance():
+    """Shapes of an instance that no longer exists are reported as removed."""
+    design_embedded = Design()
+    design_embedded.add_shape(0, 0, 1, 1)
+
+    design_old, design_new = Design(), Design()
+    inst = design_old.add_instance(3, 4, design_embedded)
+
+    diff = diff_designs(design_old, design_new)
+    assert [(path, shape.get_offsets()) for path, shape in diff.get_removed()] == [((inst,), (3, 4))]
+
+
+def test_diff_shape_moved_to_other_layer():
+    """A shape moved to another layer is reported as removed from the old layer and added to the new one."""
+    design_old, design_new = Design(), Design()
+    design_old.add_shape(0, 0, 1, 1, layer=1)
+    design_new.add_shape(0, 0, 1, 1, layer=2)
+
+    diff = diff_designs(design_old, design_new)
+    assert [shape.get_layer() for _, shape in diff.get_removed()] == [1]
+    assert [shape.get_layer() for _, shape in diff.get_added()] == [2]
+    assert diff.get_moved() == []
@@ -0,0 +1,61 @@
+import pytest
+from src.design import Design
+from src.lod_summary import GRID_SIZE
+
+
+def test_lod_summary_of_empty_design():
+    """Design.get_lod_summary() returns None if the design hierarchy has no shapes."""
+    design_top = Design()
+    design_top.add_instance(0, 0, Design())
+    assert design_top.get_lod_summary() is None
+
+
+def test_lod_summary_full_occupancy():
+    """A shape covering the whole bounding box fills every cell of the occupancy grid."""
+    design = Design()
+    design.add_shape(0, 0, 16, 8)
+    summary = design.get_lod_summary()
+    assert summary.get_bounding_box() == (0, 0, 16, 8)
+    assert summary.get_shape_count() == 1
+    assert summary.get_occupancy_grid() == tuple((1.0,) * GRID_SIZE for _ in range(GRID_SIZE))
+
+
+def test_lod_summary_partial_occupancy():
+    """Shapes only fill the cells they cover."""
+    design = Design()
+    design.add_shape(0, 0, 1, 1)    # bottom-left cell
+    design.add_shape(7, 7, 1, 1)    # top-right cell, half covered in x and y by the next shape
+    design.add_shape(15, 15, 1, 1)
+    grid = design.get_lod_summary().get_occupancy_grid()
+    assert grid[0][0] == pytest.approx(0.25)
+    assert grid[3][3] == pytest.approx(0.25)
+    assert grid[7][7] == pytest.approx(0.25)
+    assert sum(sum(row) for row in grid) == pytest.approx(0.75)
+
+
+def test_lod_summary_counts_shapes_of_every_instance():
+    """Shape counts and occupancy of embedded designs are included once per instance."""
+    design_cell = Design()
+    design_cell.add_shape(0, 0, 4, 4)
+    design_cell.add_shape(4, 4, 4, 4)
+
+    design_top = Design()
+    design_top.add_instance(0, 0, design_cell)
+    design_top.add_instance(8, 0, design_cell)
+    summary = design_top.get_lod_summary()
+    assert summary.get_bounding_box() == (0, 0, 16, 8)
+    assert summary.get_shape_count() == 4
+
+    covered_area = sum(sum(row) for row in summary.get_occupancy_grid()) * (16 * 8) / (GRID_SIZE * GRID_SIZE)
+    assert covered_area == pytest.approx(4 * 16)
+
+
+def test_lod_summary_updated_on_edit():
+    """The summary is rebuilt when an embedded design is edited."""
+    design_cell = Design()
+    design_cell.add_shape(0, 0, 4, 4)
+    design_top = Design()
+    design_top.add_instance(0, 0, design_cell)
+    assert design_top.get_lod_summary().get_shape_count() == 1
+    design_cell.add_shape(4, 4, 4, 4)
+    assert design_top.get_lod_summary().get_shape_count() == 2
@@ -0,0 +1,113 @@
+import threading
+import pytest
+from src.design import Design
+from src.rwlock import ReadWriteLock, design_lock
+
+
+def test_read_lock_is_shared():
+    """Several threads can hold the read lock at the same time."""
+    lock = ReadWriteLock()
+    readers_inside = threading.Barrier(3, timeout=5)
+
+    def reader():
+        with lock.reading():
+            readers_inside.wait()  # only passes if all 3 readers hold the lock at once
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not readers_inside.broken
+
+
+def test_write_lock_excludes_readers():
+    """A reader waits until the writer releases the write lock."""
+    lock = ReadWriteLock()
+    events = []
+    writer_inside = threading.Event()
+
+    def reader():
+        writer_inside.wait(5)
+        with lock.reading():
+            events.append('read')
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    with lock.writing():
+        writer_inside.set()
+        thread.join(0.1)
+        events.append('write done')
+    thread.join(5)
+    assert events == ['write done', 'read']
+
+
+def test_locks_are_reentrant():
+    """A thread can re-acquire the lock it holds, and read while holding the write lock."""
+    lock = ReadWriteLock()
+    with lock.reading():
+        with lock.reading():
+            pass
+    with lock.writing():
+        with lock.writing():
+            with lock.reading():
+                pass
+    with lock.writing():  # lock was fully released
+        pass
+
+
+def test_upgrade_raises_error():
+    """Acquiring the write lock while only holding the read lock raises RuntimeError instead of deadlocking."""
+    lock = ReadWriteLock()
+    with lock.reading():
+        with pytest.raises(RuntimeError):
+            with lock.writing():
+                pass
+
+
+def test_queries_do_not_lock_returned_copies():
+    """Copies returned by queries do not belong to a design, so they can be edited while reading."""
+    design = Design()
+    design.add_shape(0, 0, 1, 1)
+    with design_lock.reading():
+        shape_copy = design.get_shapes_within_one_level()[0]
+        shape_copy.shift_offsets(5, 5)
+        with pytest.raises(RuntimeError):
+            design.get_shapes()[0].shift_offsets(5, 5)
+    assert design.get_shapes()[0].get_offsets() == (0, 0)
+
+
+def test_readers_never_see_half_applied_edits():
+    """Readers running concurrently with a writer always see both shapes of a transaction at the same offset."""
+    design_cell = Design()
+    shape_1 = design_cell.add_shape(0, 0, 1, 1)
+    shape_2 = design_cell.add_shape(0, 0, 1, 1)
+    design_top = Design()
+    design_top.add_instance(10, 10, design_cell)
+
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        for i in range(300):
+            with design_lock.writing():
+                shape_1.set_offsets(i, i)
+                shape_2.set_offsets(i, i)
+        stop.set()
+
+    def reader():
+        while not stop.is_set():
+            shapes = design_top.get_shapes_within_one_level()
+            if shapes[0].get_offsets() != shapes[1].get_offsets():
+                errors.append([shape.get_offsets() for shape in shapes])
+            bbox = design_top.get_bounding_box()
+            if bbox[2] - bbox[0] != 1:
+                errors.append(bbox)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert errors == []
+    assert design_top.get_bounding_box() == (309, 309, 310, 310)
@@ -70,3 +70,29 @@ def test_non_integer_y_offset():
     """
     with pytest.raises(TypeError):
         Shape(0, 1.0, 1, 1)
+
+
+def test_layer():
+    """Shapes are on layer 0 unless another layer is given. The layer can be changed with set_layer()."""
+    shape = Shape(0, 0, 1, 1)
+    assert shape.get_layer() == 0
+    shape.set_layer(5)
+    assert shape.get_layer() == 5
+    assert Shape(0, 0, 1, 1, 3).get_layer() == 3
+
+
+def test_non_integer_layer():
+    """Shape() must raise Type Error if the layer is not an integer.
+    """
+    with pytest.raises(TypeError):
+        Shape(0, 0, 1, 1, "metal1")
+
+
+def test_shapes_on_different_layers_are_not_equal():
+    """Shapes with the same offsets and dimensions on different layers are not equal."""
+    assert Shape(0, 0, 1, 1, 1) != Shape(0, 0, 1, 1, 2)
+
+
+def test_str_includes_layer():
+    """str() of a shape includes its layer, so shapes that only differ in layer print differently."""
+    assert str(Shape(-10, 10, 78, 32, 2)) == 'x_offset:-10, y_offset:10, w:78, h:32, layer:2'